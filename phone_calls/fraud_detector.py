@@ -0,0 +1,101 @@
+"""
+Streaming detector for the query_2 pattern: a customer of a company, living in a given city and
+older than suspect_age, calls a person younger than target_age, and later calls a non-customer.
+
+Calls are consumed in started_at order. The only state kept is the earliest qualifying pattern
+call of each suspect and the targets already reported, so the work per call is constant and a
+target is reported as soon as the call that completes the pattern arrives.
+"""
+from datetime import datetime
+from typing import Dict, Iterator, Optional, Set, Tuple, Union
+
+import numpy as np
+
+from preprocess import load_table
+
+Timestamp = Union[str, datetime, np.datetime64]
+
+
+class FraudPatternDetector:
+    def __init__(self, suspects: Set[str], minors: Set[str], non_customers: Set[str]) -> None:
+        self.suspects = suspects
+        self.minors = minors
+        self.non_customers = non_customers
+        # Earliest call from each suspect to a minor
+        self.pattern_calls: Dict[str, np.datetime64] = {}
+        self.reported: Set[str] = set()
+        self.last_started_at: Optional[np.datetime64] = None
+
+    @classmethod
+    def from_files(
+        cls,
+        company: str,
+        city: str,
+        suspect_age: int,
+        target_age: int,
+        people: str = "data/people.json",
+        contracts: str = "data/contracts.json",
+    ) -> "FraudPatternDetector":
+        "Resolve suspects, minors and non-customers once from the preprocessed input files"
+        people_table = load_table(people)
+        contracts_table = load_table(contracts)
+        customers = set(
+            contracts_table.values("person_id")[
+                contracts_table.values("company_name") == company
+            ].tolist()
+        )
+        numbers = people_table.values("phone_number")
+        ages = np.asarray(people_table.values("age"))
+        has_age = np.asarray(people_table.valid.get("age", np.ones(len(ages), dtype=bool)))
+        in_city = people_table.values("city") == city
+        # Persons without personal details are the non-customers (is-customer false in Grakn)
+        is_customer = people_table.codes("first_name") >= 0
+
+        suspects = set(numbers[in_city & has_age & (ages > suspect_age)].tolist()) & customers
+        minors = set(numbers[has_age & (ages < target_age)].tolist())
+        non_customers = set(numbers[~is_customer].tolist())
+        return cls(suspects, minors, non_customers)
+
+    def observe(self, caller: str, callee: str, started_at: Timestamp) -> Optional[str]:
+        "Consume the next call; return the callee's number if this call completes the pattern"
+        started_at = np.datetime64(started_at, "s")
+        if self.last_started_at is not None and started_at < self.last_started_at:
+            raise ValueError("Calls must be observed in started_at order")
+        self.last_started_at = started_at
+
+        if caller not in self.suspects:
+            return None
+        if callee in self.minors:
+            self.pattern_calls.setdefault(caller, started_at)
+            return None
+        pattern_call = self.pattern_calls.get(caller)
+        if (
+            pattern_call is not None
+            and started_at > pattern_call
+            and callee in self.non_customers
+            and callee not in self.reported
+        ):
+            self.reported.add(callee)
+            return callee
+        return None
+
+
+def calls_from_file(filename: str = "data/calls.json") -> Iterator[Tuple[str, str, np.datetime64]]:
+    "Yield (caller, callee, started_at) from the preprocessed calls file in started_at order"
+    table = load_table(filename)
+    started_at = np.asarray(table.values("started_at"))
+    order = np.argsort(started_at, kind="stable")
+    callers = table.values("caller_id")[order].tolist()
+    callees = table.values("callee_id")[order].tolist()
+    yield from zip(callers, callees, started_at[order])
+
+
+if __name__ == "__main__":
+    detector = FraudPatternDetector.from_files(
+        company="Telecom", city="London", suspect_age=50, target_age=20
+    )
+    for caller, callee, started_at in calls_from_file():
+        target = detector.observe(caller, callee, started_at)
+        if target is not None:
+            print(f"{started_at}: {caller} called non-customer {target} after calling a minor")
+    print(f"Result:\n{sorted(detector.reported)}")
@@ -1,24 +1,36 @@
-import json
 from grakn.client import GraknClient
 
+from fraud_detector import FraudPatternDetector
+from preprocess import load_table
 
-def build_graph(keyspace_name):
+
+def build_graph(keyspace_name, detector=None):
     # Builds a Grakn graph within the specified keyspace
     with GraknClient(uri="localhost:48555") as client:
         with client.session(keyspace=keyspace_name) as session:
-            load_data_into_grakn(session)
+            load_data_into_grakn(session, detector)
 
 
-def load_data_into_grakn(session):
+def load_data_into_grakn(session, detector=None):
     # Load in the required files and generate query transactions
+    # An optional FraudPatternDetector (see fraud_detector.py) observes calls as they are inserted
     for case in INPUTS:
         data = parse_input_json(case['file'])
+        if detector is not None and case['template'] is call_template:
+            # The detector consumes calls in started_at order
+            data = sorted(data, key=lambda call: call['started_at'])
         for item in data:
             query = case['template'](item)
             with session.transaction().write() as transaction:
                 print(query)
                 transaction.query(query)
+                if 'aggregate' in case:
+                    case['aggregate'](transaction, item)
                 transaction.commit()
+            if detector is not None and case['template'] is call_template:
+                target = detector.observe(item['caller_id'], item['callee_id'], item['started_at'])
+                if target is not None:
+                    print(f"\nFraud pattern alert: {item['caller_id']} called non-customer {target}\n")
         print(f"\nInserted {len(data)} items from {case['file']} into Grakn.\n")
 
 
@@ -73,11 +85,68 @@ def call_template(call):
     return query
 
 
+def update_call_stats(transaction, call):
+    # Fold the call duration into the caller's "total" aggregates and those of the day of the call
+    caller, duration = call['caller_id'], call['duration']
+    for bucket in ('total', call['started_at'].split('T')[0]):
+        match = call_stats_match_template(caller, bucket)
+        answers = list(transaction.query(match + 'get;'))
+        if not answers:
+            transaction.query(call_stats_insert_template(caller, bucket, duration))
+            continue
+        # Attribute values are immutable, so replace the old aggregates with updated ones
+        stats = answers[0]
+        transaction.query(match + 'delete $r1, $r2, $r3, $r4;')
+        query = call_stats_update_template(
+            caller,
+            bucket,
+            count=stats.get('count').value() + 1,
+            total=stats.get('sum').value() + duration,
+            shortest=min(stats.get('min').value(), duration),
+            longest=max(stats.get('max').value(), duration),
+        )
+        transaction.query(query)
+
+
+def call_stats_match_template(phone_number, bucket):
+    # Match the call-stats of a caller for one bucket, along with its attribute ownerships
+    query = f'''
+        match $caller isa person, has phone-number "{phone_number}";
+        (stats-owner: $caller, stats: $stats) isa has-call-stats;
+        $stats has bucket "{bucket}",
+            has call-count $count via $r1, has duration-sum $sum via $r2,
+            has duration-min $min via $r3, has duration-max $max via $r4;
+    '''
+    return query
+
+
+def call_stats_insert_template(phone_number, bucket, duration):
+    # Insert the call-stats of a caller's first call in a bucket
+    query = f'''
+        match $caller isa person, has phone-number "{phone_number}";
+        insert $stats isa call-stats, has bucket "{bucket}",
+            has call-count 1, has duration-sum {duration},
+            has duration-min {duration}, has duration-max {duration};
+        (stats-owner: $caller, stats: $stats) isa has-call-stats;
+    '''
+    return query
+
+
+def call_stats_update_template(phone_number, bucket, count, total, shortest, longest):
+    # Attach the updated aggregates to an existing call-stats
+    query = f'''
+        match $caller isa person, has phone-number "{phone_number}";
+        (stats-owner: $caller, stats: $stats) isa has-call-stats;
+        $stats has bucket "{bucket}";
+        insert $stats has call-count {count}, has duration-sum {total},
+            has duration-min {shortest}, has duration-max {longest};
+    '''
+    return query
+
+
 def parse_input_json(filename):
-    # Return JSON data
-    with open(filename) as f:
-        data = json.load(f)
-    return data
+    # Return JSON data, read from the columnar cache that is only rebuilt when the file changes
+    return load_table(filename).records()
 
 
 # The filenames and methods we wish to use in this graph build operation
@@ -96,9 +165,14 @@ INPUTS = [
     },
     {
         "file": "data/calls.json",
-        "template": call_template
+        "template": call_template,
+        "aggregate": update_call_stats
     },
 ]
 
 if __name__ == "__main__":
-    build_graph(keyspace_name="phone_calls")
+    # Raise query_2 fraud alerts from the ingest stream while the calls are loaded
+    detector = FraudPatternDetector.from_files(
+        company='Telecom', city='London', suspect_age=50, target_age=20
+    )
+    build_graph(keyspace_name="phone_calls", detector=detector)
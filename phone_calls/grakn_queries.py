@@ -1,6 +1,7 @@
 """
 Run custom Graql queries on Grakn graph to answer questions based on business case.
 """
+from datetime import datetime, timedelta
 from grakn.client import GraknClient
 
 keyspace_name = "phone_calls"
@@ -16,8 +17,21 @@ def run_queries():
                 query_2(transaction, company='Telecom', city='London', suspect_age=50, target_age=20)
                 query_3(transaction, company='Telecom', person1='+7 171 898 0853', person2='+370 351 224 5176')
                 query_4(transaction, company='Telecom', poi='+48 894 777 5173')
+                query_3_batch(
+                    transaction,
+                    company='Telecom',
+                    pairs=[('+7 171 898 0853', '+370 351 224 5176'), ('+81 308 988 7153', '+54 398 559 0423')],
+                )
+                query_4_batch(transaction, company='Telecom', pois=['+48 894 777 5173', '+86 921 547 9004'])
                 query_5(transaction, company='Telecom', age=20, operator='<')
                 query_5(transaction, company='Telecom', age=40, operator='>')
+                query_5_batch(
+                    transaction,
+                    company='Telecom',
+                    brackets=[{'operator': '<', 'age': 20}, {'operator': '>', 'age': 40}],
+                )
+                query_6(transaction, company='Telecom', start='2018-09-20', end='2018-09-23')
+                query_7(transaction, person1='+261 860 539 4754', person2='+57 629 420 5680', all_paths=True)
 
 
 def query_1(transaction, **params):
@@ -99,21 +113,214 @@ def query_4(transaction, **params):
     print(f"Result:\n{result}")
 
 
+def query_3_batch(transaction, **params):
+    # query_3 for a list of (person1, person2) pairs in one match, keyed by pair
+    pairs = [tuple(pair) for pair in params['pairs']]
+    # An empty disjunction would leave the match unfiltered
+    if not pairs:
+        return {}
+    pair_filter = ' or '.join(
+        f'{{ $phone-number-a == "{person1}"; $phone-number-b == "{person2}"; }}'
+        for person1, person2 in pairs
+    )
+    query = f'''
+        match
+        $common-contact isa person, has phone-number $phone-number;
+        $company isa company, has name "{params['company']}";
+        $customer-a isa person, has phone-number $phone-number-a;
+        $customer-b isa person, has phone-number $phone-number-b;
+        {pair_filter};
+        (customer: $customer-a, provider: $company) isa contract;
+        (customer: $customer-b, provider: $company) isa contract;
+        (caller: $customer-a, callee: $common-contact) isa call;
+        (caller: $customer-b, callee: $common-contact) isa call;
+        get $phone-number-a, $phone-number-b, $phone-number;
+    '''
+    print(f"\nQuery 3 (batch):\n {query}")
+    result = {pair: set() for pair in pairs}
+    for answer in transaction.query(query):
+        pair = (answer.get('phone-number-a').value(), answer.get('phone-number-b').value())
+        result[pair].add(answer.get('phone-number').value())
+    result = {pair: sorted(contacts) for pair, contacts in result.items()}
+    print(f"Result:\n{result}")
+    return result
+
+
+def query_4_batch(transaction, **params):
+    # query_4 for a list of persons of interest in one match, keyed by POI
+    if not params['pois']:
+        return {}
+    poi_filter = ' or '.join(f'{{ $target-number == "{poi}"; }}' for poi in params['pois'])
+    query = f'''
+        match
+        $target isa person, has phone-number $target-number;
+        {poi_filter};
+        $company isa company, has name "{params['company']}";
+        $customer-a isa person, has phone-number $phone-number-a;
+        $customer-b isa person, has phone-number $phone-number-b;
+        (customer: $customer-a, provider: $company) isa contract;
+        (customer: $customer-b, provider: $company) isa contract;
+        (caller: $customer-a, callee: $customer-b) isa call;
+        (caller: $customer-a, callee: $target) isa call;
+        (caller: $customer-b, callee: $target) isa call;
+        get $target-number, $phone-number-a, $phone-number-b;
+    '''
+    print(f"\nQuery 4 (batch):\n {query}")
+    result = {poi: set() for poi in params['pois']}
+    for answer in transaction.query(query):
+        callers = result[answer.get('target-number').value()]
+        callers.add(answer.get('phone-number-a').value())
+        callers.add(answer.get('phone-number-b').value())
+    result = {poi: sorted(callers) for poi, callers in result.items()}
+    print(f"Result:\n{result}")
+    return result
+
+
 def query_5(transaction, **params):
+    # Reads the per-customer call-stats maintained by the loader instead of every call duration
     query = f'''
         match
         $customer isa person, has age {params['operator']} {params['age']};
         $company isa company, has name "{params['company']}";
         (customer: $customer, provider: $company) isa contract;
-        (caller: $customer, callee: $anyone) isa call, has duration $duration;
-        get $duration; mean $duration;
+        (stats-owner: $customer, stats: $stats) isa has-call-stats;
+        $stats has bucket "total", has call-count $count, has duration-sum $sum;
+        get $customer, $count, $sum;
     '''
     print(f"\nQuery 5:\n {query}")
-    answer = list(transaction.query(query))
+    answers = list(transaction.query(query))
+    calls = sum(answer.get('count').value() for answer in answers)
     result = 0
-    if len(answer) > 0:
-        result = answer[0].number()
+    if calls > 0:
+        result = sum(answer.get('sum').value() for answer in answers) / calls
+    print(f"Result:\n{result}")
+
+
+def query_5_batch(transaction, **params):
+    # query_5 for a list of {operator, age} brackets in one match, keyed by (operator, age)
+    comparisons = {'<': lambda a, b: a < b, '>': lambda a, b: a > b}
+    for bracket in params['brackets']:
+        if bracket['operator'] not in comparisons:
+            raise ValueError(f"Bracket operator must be '<' or '>', not '{bracket['operator']}'")
+    query = f'''
+        match
+        $customer isa person, has age $age;
+        $company isa company, has name "{params['company']}";
+        (customer: $customer, provider: $company) isa contract;
+        (stats-owner: $customer, stats: $stats) isa has-call-stats;
+        $stats has bucket "total", has call-count $count, has duration-sum $sum;
+        get $customer, $age, $count, $sum;
+    '''
+    print(f"\nQuery 5 (batch):\n {query}")
+    iterator = transaction.query(query)
+    customers = [
+        (answer.get('age').value(), answer.get('count').value(), answer.get('sum').value())
+        for answer in iterator
+    ]
+    result = {}
+    for bracket in params['brackets']:
+        compare = comparisons[bracket['operator']]
+        selected = [(count, total) for age, count, total in customers if compare(age, bracket['age'])]
+        calls = sum(count for count, _ in selected)
+        result[(bracket['operator'], bracket['age'])] = (
+            sum(total for _, total in selected) / calls if calls else 0
+        )
+    print(f"Result:\n{result}")
+    return result
+
+
+def query_6(transaction, **params):
+    # Call count and duration statistics of each customer over a window of days, read from the
+    # daily call-stats buckets
+    start = datetime.strptime(params['start'], '%Y-%m-%d')
+    end = datetime.strptime(params['end'], '%Y-%m-%d')
+    # An empty window would drop the day filter and also match the "total" buckets
+    if start > end:
+        raise ValueError(f"Window start {params['start']} is after its end {params['end']}")
+    days = [(start + timedelta(days=i)).strftime('%Y-%m-%d') for i in range((end - start).days + 1)]
+    day_filter = ' or '.join(f'{{ $bucket == "{day}"; }}' for day in days)
+    query = f'''
+        match
+        $customer isa person, has phone-number $phone-number;
+        $company isa company, has name "{params['company']}";
+        (customer: $customer, provider: $company) isa contract;
+        (stats-owner: $customer, stats: $stats) isa has-call-stats;
+        $stats has bucket $bucket, has call-count $count, has duration-sum $sum,
+            has duration-min $min, has duration-max $max;
+        {day_filter};
+        get $stats, $phone-number, $count, $sum, $min, $max;
+    '''
+    print(f"\nQuery 6:\n {query}")
+    customers = {}
+    for answer in transaction.query(query):
+        stats = customers.setdefault(
+            answer.get('phone-number').value(),
+            {'calls': 0, 'totalDuration': 0, 'minCallDuration': None, 'maxCallDuration': None},
+        )
+        stats['calls'] += answer.get('count').value()
+        stats['totalDuration'] += answer.get('sum').value()
+        shortest, longest = answer.get('min').value(), answer.get('max').value()
+        if stats['minCallDuration'] is None or shortest < stats['minCallDuration']:
+            stats['minCallDuration'] = shortest
+        if stats['maxCallDuration'] is None or longest > stats['maxCallDuration']:
+            stats['maxCallDuration'] = longest
+    result = [
+        {
+            'phoneNumber': phone_number,
+            'calls': stats['calls'],
+            'avgCallDuration': stats['totalDuration'] / stats['calls'],
+            'minCallDuration': stats['minCallDuration'],
+            'maxCallDuration': stats['maxCallDuration'],
+        }
+        for phone_number, stats in customers.items()
+    ]
+    result = sorted(result, key=lambda x: x['avgCallDuration'], reverse=True)
+    print(f"Result:\n{result}")
+    return result
+
+
+def query_7(transaction, **params):
+    # Shortest call paths between two persons within a maximum number of hops
+    # Grakn's compute path treats relations as undirected, so only direction "both" is supported
+    if params.get('direction', 'both') != 'both':
+        raise ValueError("Grakn compute path only supports direction 'both'")
+    ids_query = f'''
+        match $person1 isa person, has phone-number "{params['person1']}";
+        $person2 isa person, has phone-number "{params['person2']}";
+        get;
+    '''
+    answers = list(transaction.query(ids_query))
+    if not answers:
+        return []
+    person1, person2 = answers[0].get('person1').id, answers[0].get('person2').id
+
+    query = f'''
+        compute path from {person1}, to {person2}, in [person, call];
+    '''
+    print(f"\nQuery 7:\n {query}")
+    max_hops = params.get('max_hops', 6)
+    # Paths alternate between person and call concepts: n hops hold n + 1 persons and n calls
+    paths = [answer.list() for answer in transaction.query(query)]
+    paths = [path for path in paths if (len(path) - 1) // 2 <= max_hops]
+    if not params.get('all_paths'):
+        paths = paths[:1]
+
+    # Convert the persons on all paths back to phone numbers with a single match
+    concept_ids = sorted({concept_id for path in paths for concept_id in path[::2]})
+    phone_numbers = {}
+    if concept_ids:
+        id_filter = ' or '.join(f'{{ $person id {concept_id}; }}' for concept_id in concept_ids)
+        persons_query = f'''
+            match $person isa person, has phone-number $phone-number;
+            {id_filter};
+            get;
+        '''
+        for answer in transaction.query(persons_query):
+            phone_numbers[answer.get('person').id] = answer.get('phone-number').value()
+
+    result = [[phone_numbers[concept_id] for concept_id in path[::2]] for path in paths]
     print(f"Result:\n{result}")
+    return result
 
 
 if __name__ == "__main__":
@@ -0,0 +1,161 @@
+"""
+Answer batched phone_calls queries locally from the preprocessed input files, without a database.
+
+Calls are held as sorted adjacency arrays (CSR), so common neighbours of two persons are a merge
+of two sorted arrays, screening every customer pair is a single in-memory sweep, and "how is
+person X connected to person Y" is the bidirectional BFS in shared/paths.py, which always
+expands the smaller frontier.
+"""
+from itertools import combinations
+from time import time
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from preprocess import load_table
+from shared.columnar import build_csr
+from shared.paths import Adjacency, shortest_paths
+
+DIRECTIONS = ("out", "in", "both")
+
+
+class CallGraph:
+    "Persons (indexed by sorted phone number) and sorted caller/callee adjacency arrays"
+
+    def __init__(
+        self,
+        people: str = "data/people.json",
+        contracts: str = "data/contracts.json",
+        calls: str = "data/calls.json",
+    ) -> None:
+        people_table = load_table(people)
+        contracts_table = load_table(contracts)
+        calls_table = load_table(calls)
+
+        self.phone_numbers = np.unique(
+            np.concatenate(
+                [
+                    people_table.unique("phone_number"),
+                    calls_table.unique("caller_id"),
+                    calls_table.unique("callee_id"),
+                    contracts_table.unique("person_id"),
+                ]
+            )
+        )
+        n = len(self.phone_numbers)
+        callers = self.index(calls_table.values("caller_id"))
+        callees = self.index(calls_table.values("callee_id"))
+        # Each adjacency keeps one entry per distinct neighbour, like DISTINCT in the graph queries
+        pairs = np.unique(np.stack([callers, callees], axis=1), axis=0)
+        self.out_indptr, self.out_indices, _ = build_csr(pairs[:, 0], pairs[:, 1], n)
+        self.in_indptr, self.in_indices, _ = build_csr(pairs[:, 1], pairs[:, 0], n)
+        both = np.unique(np.concatenate([pairs, pairs[:, ::-1]]), axis=0)
+        self.any_indptr, self.any_indices, _ = build_csr(both[:, 0], both[:, 1], n)
+
+        companies = contracts_table.values("company_name")
+        customers = self.index(contracts_table.values("person_id"))
+        self.customers = {
+            company: np.unique(customers[companies == company]) for company in np.unique(companies)
+        }
+
+    def index(self, phone_numbers: Sequence[str]) -> np.ndarray:
+        "Person indices of the given phone numbers (-1 for unknown numbers)"
+        phone_numbers = np.asarray(phone_numbers, dtype=str)
+        positions = np.searchsorted(self.phone_numbers, phone_numbers)
+        positions = np.minimum(positions, len(self.phone_numbers) - 1)
+        return np.where(self.phone_numbers[positions] == phone_numbers, positions, -1)
+
+    def callees(self, i: int) -> np.ndarray:
+        return self.out_indices[self.out_indptr[i] : self.out_indptr[i + 1]]
+
+    def callers(self, i: int) -> np.ndarray:
+        return self.in_indices[self.in_indptr[i] : self.in_indptr[i + 1]]
+
+    def contacts(self, i: int) -> np.ndarray:
+        "Persons that called or were called by person i"
+        return self.any_indices[self.any_indptr[i] : self.any_indptr[i + 1]]
+
+    def customers_of(self, company: str) -> np.ndarray:
+        return self.customers.get(company, np.zeros(0, dtype=np.int64))
+
+    def adjacency(self, direction: str) -> Tuple[Adjacency, Adjacency]:
+        "(forward, backward) adjacency for paths that follow calls in the given direction"
+        out_edges = (self.out_indptr, self.out_indices)
+        in_edges = (self.in_indptr, self.in_indices)
+        if direction == "out":
+            return out_edges, in_edges
+        if direction == "in":
+            return in_edges, out_edges
+        if direction == "both":
+            any_edges = (self.any_indptr, self.any_indices)
+            return any_edges, any_edges
+        raise ValueError(f"Direction must be one of {DIRECTIONS}, not '{direction}'")
+
+
+def query_3_batch(
+    graph: CallGraph, company: str, pairs: Sequence[Tuple[str, str]]
+) -> Dict[Tuple[str, str], List[str]]:
+    "Common contacts called by both customers of each pair, keyed by the pair"
+    customers = graph.customers_of(company)
+    result = {}
+    indices = graph.index([person for pair in pairs for person in pair]).reshape(-1, 2)
+    for (person1, person2), (i, j) in zip(pairs, indices):
+        if i < 0 or j < 0 or not np.isin([i, j], customers).all():
+            result[(person1, person2)] = []
+            continue
+        common = np.intersect1d(graph.callees(i), graph.callees(j), assume_unique=True)
+        result[(person1, person2)] = graph.phone_numbers[common].tolist()
+    return result
+
+
+def query_4_batch(graph: CallGraph, company: str, pois: Sequence[str]) -> Dict[str, List[str]]:
+    "Customers who called each person of interest and also called one another, keyed by POI"
+    customers = graph.customers_of(company)
+    result = {}
+    for poi, i in zip(pois, graph.index(pois)):
+        if i < 0:
+            result[poi] = []
+            continue
+        callers = np.intersect1d(graph.callers(i), customers, assume_unique=True)
+        linked = [
+            c for c in callers if len(np.intersect1d(graph.contacts(c), callers, assume_unique=True))
+        ]
+        result[poi] = graph.phone_numbers[np.array(linked, dtype=np.int64)].tolist()
+    return result
+
+
+def degrees_of_separation(
+    graph: CallGraph,
+    person1: str,
+    person2: str,
+    max_hops: int = 6,
+    direction: str = "out",
+    all_paths: bool = False,
+) -> List[List[str]]:
+    "Shortest call paths between two persons, as lists of phone numbers"
+    forward, backward = graph.adjacency(direction)
+    source, target = graph.index([person1, person2]).tolist()
+    if source < 0 or target < 0:
+        return []
+    paths = shortest_paths(forward, backward, source, target, max_hops, all_paths)
+    return [graph.phone_numbers[path].tolist() for path in paths]
+
+
+def main() -> None:
+    start_time = time()
+    graph = CallGraph()
+    # Sweep every pair of Telecom customers and every called person in one pass each
+    customers = graph.phone_numbers[graph.customers_of("Telecom")].tolist()
+    common_contacts = query_3_batch(graph, "Telecom", list(combinations(customers, 2)))
+    co_callers = query_4_batch(graph, "Telecom", graph.phone_numbers.tolist())
+    num_pairs = sum(1 for contacts in common_contacts.values() if contacts)
+    num_pois = sum(1 for callers in co_callers.values() if callers)
+    print(f"Customer pairs with common contacts: {num_pairs} of {len(common_contacts)}")
+    print(f"Persons called by linked customers: {num_pois} of {len(co_callers)}")
+    paths = degrees_of_separation(graph, "+261 860 539 4754", "+57 629 420 5680", all_paths=True)
+    print(f"Shortest call paths from +261 860 539 4754 to +57 629 420 5680:\n{paths}")
+    print(f"Ran queries in {time() - start_time:.2f} seconds")
+
+
+if __name__ == "__main__":
+    main()
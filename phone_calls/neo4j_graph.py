@@ -1,18 +1,46 @@
 """
 Use the Neo4j official Python bolt driver to populate a Neo4j graph
 """
-import json
+import numpy as np
 from neo4j import GraphDatabase
 from neo4j.work.transaction import Transaction
-from typing import Dict
+from typing import Dict, List
+
+from preprocess import load_table
+
+# Fold the duration of a newly created call `d` from caller `p1` into the caller's running
+# totals and into the caller's CallStats node for the day of the call
+UPDATE_CALL_STATS = """
+  MERGE (s:CallStats {personID: p1.personID, day: date(datetime(d.started_at))})
+  SET s.callCount = coalesce(s.callCount, 0) + 1,
+      s.callDurationSum = coalesce(s.callDurationSum, 0) + d.duration,
+      s.minCallDuration = CASE WHEN s.minCallDuration IS NULL OR d.duration < s.minCallDuration
+                          THEN d.duration ELSE s.minCallDuration END,
+      s.maxCallDuration = CASE WHEN s.maxCallDuration IS NULL OR d.duration > s.maxCallDuration
+                          THEN d.duration ELSE s.maxCallDuration END
+  SET p1.callCount = coalesce(p1.callCount, 0) + 1,
+      p1.callDurationSum = coalesce(p1.callDurationSum, 0) + d.duration,
+      p1.minCallDuration = CASE WHEN p1.minCallDuration IS NULL OR d.duration < p1.minCallDuration
+                           THEN d.duration ELSE p1.minCallDuration END,
+      p1.maxCallDuration = CASE WHEN p1.maxCallDuration IS NULL OR d.duration > p1.maxCallDuration
+                           THEN d.duration ELSE p1.maxCallDuration END
+"""
 
 
 class Neo4jConnection:
     def __init__(
-        self, uri: str, user: str, password: str, filenames: Dict[str, str]
+        self,
+        uri: str,
+        user: str,
+        password: str,
+        filenames: Dict[str, str],
+        append_only: bool = False,
     ) -> None:
         self.driver = GraphDatabase.driver(uri, auth=(user, password))
         self.filenames = filenames
+        # Calls are immutable events: in append-only mode they are deduplicated on the client
+        # and CREATEd without per-row existence checks, so every call file must only be loaded once
+        self.append_only = append_only
 
     def close(self) -> None:
         self.driver.close()
@@ -27,7 +55,13 @@ class Neo4jConnection:
             session.write_transaction(
                 self._create_contracts, self.filenames["contracts"]
             )
-            session.write_transaction(self._create_calls, self.filenames["calls"])
+            if self.append_only:
+                calls_by_day = dedupe_calls(self.filenames["calls"])
+                session.write_transaction(self._create_call_endpoints, calls_by_day)
+                for day, calls in calls_by_day.items():
+                    session.write_transaction(self._append_calls, day, calls)
+            else:
+                session.write_transaction(self._create_calls, self.filenames["calls"])
 
     @staticmethod
     def _create_indexes_and_constraints(tx: Transaction) -> None:
@@ -35,6 +69,7 @@ class Neo4jConnection:
         index_queries = [
             # indexes
             "CREATE INDEX company_name IF NOT EXISTS FOR (c:Company) ON (c.name) ",
+            "CREATE INDEX call_stats IF NOT EXISTS FOR (s:CallStats) ON (s.personID, s.day) ",
             # constraints
             "CREATE CONSTRAINT IF NOT EXISTS ON (p:Person) ASSERT p.personID IS UNIQUE ",
         ]
@@ -87,21 +122,82 @@ class Neo4jConnection:
             MERGE (p1:Person {personID: d.caller_id})
             MERGE (p2:Person {personID: d.callee_id})
             WITH p1, p2, d, toUpper(replace(split(d.started_at, 'T')[0], '-', '_')) AS rel_type
+              // Only calls that are not in the graph yet are added to the aggregates
+              OPTIONAL MATCH (p1) -[existing]-> (p2)
+              WHERE type(existing) = 'CALL_' + rel_type
+                AND existing.started_at = datetime(d.started_at)
+                AND existing.call_duration = d.duration
+            WITH p1, p2, d, rel_type, count(existing) = 0 AS is_new
               CALL apoc.merge.relationship(p1, 'CALL_' + rel_type,
                   {started_at: datetime(d.started_at), call_duration: d.duration}, NULL, p2,
                   {started_at: datetime(d.started_at), call_duration: d.duration}
               )
               YIELD rel
+            WITH p1, d, is_new
+            WHERE is_new
+            """
+            + UPDATE_CALL_STATS
+            + """
             RETURN d
             """,
             data=data,
         )
 
+    @staticmethod
+    def _create_call_endpoints(tx: Transaction, calls_by_day: Dict[str, List[dict]]) -> None:
+        "Create every caller and callee once, before the calls are appended"
+        person_ids = set()
+        for calls in calls_by_day.values():
+            person_ids.update(c["caller_id"] for c in calls)
+            person_ids.update(c["callee_id"] for c in calls)
+        tx.run(
+            """
+            UNWIND $person_ids AS person_id
+            MERGE (:Person {personID: person_id})
+            """,
+            person_ids=sorted(person_ids),
+        )
+
+    @staticmethod
+    def _append_calls(tx: Transaction, day: str, data: List[dict]) -> None:
+        "CREATE the calls of one day without checking for existing relationships"
+        rel_type = "CALL_" + day.replace("-", "_")
+        tx.run(
+            f"""
+            UNWIND $data AS d
+            MATCH (p1:Person {{personID: d.caller_id}})
+            MATCH (p2:Person {{personID: d.callee_id}})
+            CREATE (p1) -[:{rel_type} {{started_at: datetime(d.started_at), call_duration: d.duration}}]-> (p2)
+            WITH p1, d
+            """
+            + UPDATE_CALL_STATS,
+            data=data,
+        )
+
+
+def dedupe_calls(filename: str) -> Dict[str, List[dict]]:
+    "Drop repeated (caller, callee, started_at) calls and group the rest by day of the call"
+    table = load_table(filename)
+    keys = np.stack(
+        [
+            table.codes("caller_id").astype(np.int64),
+            table.codes("callee_id").astype(np.int64),
+            np.asarray(table.values("started_at")).astype(np.int64),
+        ],
+        axis=1,
+    )
+    _, first = np.unique(keys, axis=0, return_index=True)
+    records = table.records()
+    calls_by_day: Dict[str, List[dict]] = {}
+    for i in np.sort(first).tolist():
+        call = records[i]
+        calls_by_day.setdefault(call["started_at"].split("T")[0], []).append(call)
+    return calls_by_day
+
 
 def parse_input_json(filename):
-    with open(filename) as f:
-        data = json.load(f)
-    return data
+    # Read rows from the columnar cache, which is only rebuilt when the JSON file changes
+    return load_table(filename).records()
 
 
 if __name__ == "__main__":
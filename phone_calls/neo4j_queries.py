@@ -66,12 +66,56 @@ def query_4(driver: BoltDriver, **params) -> None:
         print(f"Result:\n{result.data()}")
 
 
+def query_3_batch(driver: BoltDriver, **params) -> dict:
+    "query_3 for a list of (person1, person2) pairs in a single UNWIND, keyed by pair"
+    with driver.session() as session:
+        query = """
+            UNWIND $pairs AS pair
+            MATCH (p1:Person {personID: pair[0]}) -[:HAS_CONTRACT]-> (c:Company {name: $company})
+            MATCH (p2:Person {personID: pair[1]}) -[:HAS_CONTRACT]-> (c)
+            MATCH (p1) --> (contact:Person) <-- (p2)
+            WITH pair, collect(DISTINCT contact.personID) AS commonContacts
+            RETURN pair[0] AS person1, pair[1] AS person2, commonContacts
+        """
+        print(f"\nQuery 3 (batch):\n {query}")
+        pairs = [list(pair) for pair in params["pairs"]]
+        result = {tuple(pair): [] for pair in pairs}
+        for record in session.run(query, company=params["company"], pairs=pairs):
+            result[(record["person1"], record["person2"])] = record["commonContacts"]
+        print(f"Result:\n{result}")
+        return result
+
+
+def query_4_batch(driver: BoltDriver, **params) -> dict:
+    "query_4 for a list of persons of interest in a single UNWIND, keyed by POI"
+    with driver.session() as session:
+        query = """
+            UNWIND $pois AS poiID
+            MATCH (poi:Person {personID: poiID})
+            MATCH (c:Company {name: $company}) <-- (p:Person) --> (poi)
+            WITH poi, collect(DISTINCT p) AS callers
+              UNWIND callers AS caller
+              UNWIND callers AS callee
+            WITH poi, caller, callee
+              MATCH (caller) -- (callee)
+            WITH poi, collect(DISTINCT caller.personID) AS callers
+              RETURN poi.personID AS poi, callers
+        """
+        print(f"\nQuery 4 (batch):\n {query}")
+        result = {poi: [] for poi in params["pois"]}
+        for record in session.run(query, company=params["company"], pois=list(params["pois"])):
+            result[record["poi"]] = record["callers"]
+        print(f"Result:\n{result}")
+        return result
+
+
 def query_5(driver: BoltDriver, **params) -> None:
     with driver.session() as session:
         query = """
-            MATCH (company:Company {name: $company}) <-[:HAS_CONTRACT]- (customer:Person) -[called]-> (p:Person)
-            WHERE customer.age > $age AND EXISTS (called.call_duration)
-            RETURN customer.fullName as name, avg(called.call_duration) AS avgCallDuration
+            MATCH (company:Company {name: $company}) <-[:HAS_CONTRACT]- (customer:Person)
+            WHERE customer.age > $age AND customer.callCount > 0
+            RETURN customer.fullName as name,
+                   toFloat(customer.callDurationSum) / customer.callCount AS avgCallDuration
             ORDER BY avgCallDuration DESC LIMIT 3
         """
         print(f"\nQuery 5:\n {query}")
@@ -79,6 +123,79 @@ def query_5(driver: BoltDriver, **params) -> None:
         print(f"Result:\n{result.data()}")
 
 
+def query_5_batch(driver: BoltDriver, **params) -> dict:
+    "query_5 for a list of {operator, age} brackets in a single pass, keyed by (operator, age)"
+    for bracket in params["brackets"]:
+        if bracket["operator"] not in ("<", ">"):
+            raise ValueError(f"Bracket operator must be '<' or '>', not '{bracket['operator']}'")
+    with driver.session() as session:
+        query = """
+            MATCH (company:Company {name: $company}) <-[:HAS_CONTRACT]- (customer:Person)
+            WHERE customer.callCount > 0
+            UNWIND $brackets AS bracket
+            WITH bracket, customer
+            WHERE (bracket.operator = '<' AND customer.age < bracket.age)
+               OR (bracket.operator = '>' AND customer.age > bracket.age)
+            WITH bracket, customer.fullName AS name,
+                 toFloat(customer.callDurationSum) / customer.callCount AS avgCallDuration
+            ORDER BY avgCallDuration DESC
+            WITH bracket, collect({name: name, avgCallDuration: avgCallDuration})[..3] AS customers
+            RETURN bracket.operator AS operator, bracket.age AS age, customers
+        """
+        print(f"\nQuery 5 (batch):\n {query}")
+        brackets = [{"operator": b["operator"], "age": b["age"]} for b in params["brackets"]]
+        result = {(b["operator"], b["age"]): [] for b in brackets}
+        for record in session.run(query, company=params["company"], brackets=brackets):
+            result[(record["operator"], record["age"])] = record["customers"]
+        print(f"Result:\n{result}")
+        return result
+
+
+def query_6(driver: BoltDriver, **params) -> None:
+    "Call count and duration statistics of each customer over a window of days"
+    with driver.session() as session:
+        query = """
+            MATCH (company:Company {name: $company}) <-[:HAS_CONTRACT]- (customer:Person)
+            MATCH (s:CallStats {personID: customer.personID})
+            WHERE date($start) <= s.day <= date($end)
+            WITH customer, sum(s.callCount) AS calls, sum(s.callDurationSum) AS totalDuration,
+                 min(s.minCallDuration) AS minCallDuration, max(s.maxCallDuration) AS maxCallDuration
+            RETURN customer.fullName AS name, calls, toFloat(totalDuration) / calls AS avgCallDuration,
+                   minCallDuration, maxCallDuration
+            ORDER BY avgCallDuration DESC
+        """
+        print(f"\nQuery 6:\n {query}")
+        result = session.run(query, params)
+        print(f"Result:\n{result.data()}")
+
+
+def query_7(driver: BoltDriver, **params) -> None:
+    "Shortest call paths between two persons within a maximum number of hops"
+    patterns = {"out": "-[*..{}]->", "in": "<-[*..{}]-", "both": "-[*..{}]-"}
+    direction = params.get("direction", "out")
+    if direction not in patterns:
+        raise ValueError(f"Direction must be one of {tuple(patterns)}, not '{direction}'")
+    pattern = patterns[direction].format(int(params.get("max_hops", 6)))
+    function = "allShortestPaths" if params.get("all_paths") else "shortestPath"
+    with driver.session() as session:
+        if params["person1"] == params["person2"]:
+            # shortestPath fails when both ends are the same node: the path is the person alone
+            query = """
+                MATCH (p1:Person {personID: $person1})
+                RETURN [p1.personID] AS path
+            """
+        else:
+            query = f"""
+                MATCH (p1:Person {{personID: $person1}}), (p2:Person {{personID: $person2}})
+                MATCH path = {function}((p1) {pattern} (p2))
+                WHERE all(r IN relationships(path) WHERE type(r) STARTS WITH 'CALL_')
+                RETURN [person IN nodes(path) | person.personID] AS path
+            """
+        print(f"\nQuery 7:\n {query}")
+        result = session.run(query, person1=params["person1"], person2=params["person2"])
+        print(f"Result:\n{result.data()}")
+
+
 def main() -> None:
     start_time = time()
     driver = GraphDatabase.driver("bolt://localhost:7687", auth=("neo4j", "12345"))
@@ -87,7 +204,20 @@ def main() -> None:
     query_2(driver, company='Telecom', city='London', suspect_age=50, target_age=20)
     query_3(driver, company='Telecom', person1='+7 171 898 0853', person2='+370 351 224 5176')
     query_4(driver, company='Telecom', poi='+48 894 777 5173')
+    query_3_batch(
+        driver,
+        company='Telecom',
+        pairs=[('+7 171 898 0853', '+370 351 224 5176'), ('+81 308 988 7153', '+54 398 559 0423')],
+    )
+    query_4_batch(driver, company='Telecom', pois=['+48 894 777 5173', '+86 921 547 9004'])
     query_5(driver, company='Telecom', age=40)
+    query_5_batch(
+        driver,
+        company='Telecom',
+        brackets=[{'operator': '<', 'age': 20}, {'operator': '>', 'age': 40}],
+    )
+    query_6(driver, company='Telecom', start='2018-09-20', end='2018-09-23')
+    query_7(driver, person1='+261 860 539 4754', person2='+57 629 420 5680', max_hops=6, all_paths=True)
     print(f"Ran queries in {time() - start_time:.2f} seconds")
 
 
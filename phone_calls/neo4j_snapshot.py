@@ -0,0 +1,59 @@
+"""
+Export the live Neo4j graph of this dataset into a compact, memory-mapped binary snapshot.
+
+The export and the Snapshot reader are implemented in shared/snapshot.py; this module only
+configures which labels, relationships and properties of this dataset are exported.
+"""
+from neo4j import GraphDatabase, BoltDriver
+
+from preprocess import DATETIME_FIELDS
+from shared import snapshot as shared_snapshot
+from shared.snapshot import PAGE_SIZE, open_snapshot
+
+# Node labels to export: the unique key of each label and its property columns
+NODES = {
+    "Person": {"key": "personID", "properties": ["firstName", "lastName", "city", "age"]},
+    "Company": {"key": "name", "properties": []},
+}
+
+# Relationships to export: source/target labels, the MATCH pattern (binding a, r, b)
+# and the Cypher expressions of the relationship properties. The per-day CALL_<date>
+# relationship types are exported together as a single CALL relationship.
+RELATIONSHIPS = {
+    "HAS_CONTRACT": {
+        "source": "Person",
+        "target": "Company",
+        "pattern": "(a:Person) -[r:HAS_CONTRACT]-> (b:Company)",
+        "properties": {},
+    },
+    "CALL": {
+        "source": "Person",
+        "target": "Person",
+        "pattern": "(a:Person) -[r]-> (b:Person)",
+        "where": "type(r) STARTS WITH 'CALL_'",
+        "properties": {
+            "started_at": "r.started_at.epochSeconds",
+            "call_duration": "r.call_duration",
+        },
+    },
+}
+
+# Properties exported as epoch seconds that are stored as datetime64, the same fields that
+# are timestamps in the preprocessed inputs
+DATETIME_PROPERTIES = DATETIME_FIELDS
+
+
+def export_snapshot(driver: BoltDriver, path: str, page_size: int = PAGE_SIZE) -> None:
+    "Stream the graph out of Neo4j and write it as a snapshot directory"
+    shared_snapshot.export_snapshot(
+        driver, path, NODES, RELATIONSHIPS, DATETIME_PROPERTIES, page_size=page_size
+    )
+
+
+if __name__ == "__main__":
+    driver = GraphDatabase.driver("bolt://localhost:7687", auth=("neo4j", "12345"))
+    print("Exporting snapshot...")
+    export_snapshot(driver, "data/snapshot")
+    driver.close()
+    snapshot = open_snapshot("data/snapshot")
+    print(f"Finished! Snapshot contains {snapshot.num_edges('CALL')} calls")
@@ -0,0 +1,184 @@
+"""
+Partition the phone calls graph across several Neo4j databases by call date, and answer queries
+by fanning out to every shard in parallel and merging the partial aggregates.
+
+Each shard owns a contiguous range of call days. Companies, people and contracts are small
+reference data, so every shard holds all of them: both ends of a call are then always on the
+shard of the call, and no call edge crosses shards. What is split is the per-person call
+aggregates (callCount, callDurationSum, ...), which each shard only holds for its own days, so
+queries return per-shard sums, counts, minima and maxima and combine them on the client.
+"""
+from time import time
+from typing import Dict, List, Sequence, Tuple
+
+from neo4j import BoltDriver
+
+from neo4j_graph import Neo4jConnection, dedupe_calls
+from shared.sharding import SHARD_URIS, ShardedConnection, scatter
+
+
+def assign_days(calls_per_day: Dict[str, int], num_shards: int) -> Dict[str, int]:
+    "Split the sorted call days into contiguous ranges holding similar numbers of calls"
+    total = sum(calls_per_day.values())
+    day_shards = {}
+    seen = 0
+    for day in sorted(calls_per_day):
+        day_shards[day] = min(seen * num_shards // max(total, 1), num_shards - 1)
+        seen += calls_per_day[day]
+    return day_shards
+
+
+def partition(
+    filename: str, num_shards: int
+) -> Tuple[Dict[str, int], List[Dict[str, List[dict]]]]:
+    """
+    Deduplicate the calls and route each day of calls to a shard. Returns the day -> shard map
+    and, per shard, the calls to load there grouped by day.
+    """
+    calls_by_day = dedupe_calls(filename)
+    day_shards = assign_days(
+        {day: len(calls) for day, calls in calls_by_day.items()}, num_shards
+    )
+    shards: List[Dict[str, List[dict]]] = [{} for _ in range(num_shards)]
+    for day, calls in calls_by_day.items():
+        shards[day_shards[day]][day] = calls
+    return day_shards, shards
+
+
+class ShardedNeo4jConnection(ShardedConnection):
+    def run(self) -> Dict[str, int]:
+        """
+        Load every shard in parallel and return the day -> shard map that was used.
+
+        NOTE: Calls are appended without existence checks (see Neo4jConnection.append_only),
+        so each call file must only be loaded once.
+        """
+        day_shards, shards = partition(self.filenames["calls"], len(self.drivers))
+        self.load_shards(shards)
+        return day_shards
+
+    def _load_shard(
+        self, driver: BoltDriver, shard: int, calls_by_day: Dict[str, List[dict]]
+    ) -> None:
+        with driver.session() as session:
+            session.write_transaction(Neo4jConnection._create_indexes_and_constraints)
+            # Reference data is replicated, so every call has both of its ends on its shard
+            session.write_transaction(
+                Neo4jConnection._create_companies, self.filenames["companies"]
+            )
+            session.write_transaction(Neo4jConnection._create_people, self.filenames["people"])
+            session.write_transaction(
+                Neo4jConnection._create_contracts, self.filenames["contracts"]
+            )
+            session.write_transaction(Neo4jConnection._create_call_endpoints, calls_by_day)
+            for day, calls in calls_by_day.items():
+                session.write_transaction(Neo4jConnection._append_calls, day, calls)
+
+
+def merge_call_stats(partials: List[List[dict]]) -> Dict[str, dict]:
+    """
+    Combine per-shard call statistics of each person, keyed by personID: counts and duration
+    sums add up, minima and maxima are taken over the shards that saw calls
+    """
+    merged: Dict[str, dict] = {}
+    for record in (record for partial in partials for record in partial):
+        stats = merged.get(record["personID"])
+        if stats is None:
+            merged[record["personID"]] = dict(record)
+            continue
+        stats["calls"] += record["calls"]
+        stats["totalDuration"] += record["totalDuration"]
+        if "minCallDuration" in record:
+            stats["minCallDuration"] = min(stats["minCallDuration"], record["minCallDuration"])
+            stats["maxCallDuration"] = max(stats["maxCallDuration"], record["maxCallDuration"])
+    for stats in merged.values():
+        stats["avgCallDuration"] = stats["totalDuration"] / stats["calls"]
+    return merged
+
+
+def query_1(drivers: Sequence[BoltDriver], **params) -> List[str]:
+    "Callers of a person of interest after a timestamp, as the union over all shards"
+    query = """
+        MATCH (callee:Person {personID: $poi}) <-[r]- (caller:Person)
+        WHERE r.started_at > datetime($timestamp)
+        RETURN DISTINCT caller.personID AS caller
+    """
+    print(f"\nQuery 1 (sharded):\n {query}")
+    partials = scatter(drivers, query, **params)
+    result = sorted({record["caller"] for partial in partials for record in partial})
+    print(f"Result:\n{result}")
+    return result
+
+
+def query_5(drivers: Sequence[BoltDriver], **params) -> List[dict]:
+    "Customers older than an age with the highest average call duration over all shards"
+    # Averages do not merge, so each shard returns the sum and count of every matching customer
+    query = """
+        MATCH (company:Company {name: $company}) <-[:HAS_CONTRACT]- (customer:Person)
+        WHERE customer.age > $age AND customer.callCount > 0
+        RETURN customer.personID AS personID, customer.fullName AS name,
+               customer.callCount AS calls, customer.callDurationSum AS totalDuration
+    """
+    print(f"\nQuery 5 (sharded):\n {query}")
+    merged = merge_call_stats(scatter(drivers, query, **params))
+    result = [
+        {"name": stats["name"], "avgCallDuration": stats["avgCallDuration"]}
+        for stats in sorted(
+            merged.values(), key=lambda stats: (-stats["avgCallDuration"], stats["personID"])
+        )[: params.get("k", 3)]
+    ]
+    print(f"Result:\n{result}")
+    return result
+
+
+def query_6(drivers: Sequence[BoltDriver], **params) -> List[dict]:
+    "Call count and duration statistics of each customer over a window of days, over all shards"
+    query = """
+        MATCH (company:Company {name: $company}) <-[:HAS_CONTRACT]- (customer:Person)
+        MATCH (s:CallStats {personID: customer.personID})
+        WHERE date($start) <= s.day <= date($end)
+        RETURN customer.personID AS personID, customer.fullName AS name,
+               sum(s.callCount) AS calls, sum(s.callDurationSum) AS totalDuration,
+               min(s.minCallDuration) AS minCallDuration, max(s.maxCallDuration) AS maxCallDuration
+    """
+    print(f"\nQuery 6 (sharded):\n {query}")
+    merged = merge_call_stats(scatter(drivers, query, **params))
+    result = [
+        {
+            "name": stats["name"],
+            "calls": stats["calls"],
+            "avgCallDuration": stats["avgCallDuration"],
+            "minCallDuration": stats["minCallDuration"],
+            "maxCallDuration": stats["maxCallDuration"],
+        }
+        for stats in sorted(merged.values(), key=lambda stats: -stats["avgCallDuration"])
+    ]
+    print(f"Result:\n{result}")
+    return result
+
+
+def main() -> None:
+    filenames = {
+        "companies": "data/companies.json",
+        "people": "data/people.json",
+        "contracts": "data/contracts.json",
+        "calls": "data/calls.json",
+    }
+    connection = ShardedNeo4jConnection(
+        uris=SHARD_URIS, user="neo4j", password="12345", filenames=filenames
+    )
+    print(f"Building graph across {len(SHARD_URIS)} shards...")
+    start_time = time()
+    day_shards = connection.run()
+    print(f"Loaded shards in {time() - start_time:.2f} seconds; day -> shard:\n{day_shards}")
+
+    start_time = time()
+    query_1(connection.drivers, poi="+86 921 547 9004", timestamp="2018-09-14T17:18:49")
+    query_5(connection.drivers, company='Telecom', age=40)
+    query_6(connection.drivers, company='Telecom', start='2018-09-20', end='2018-09-23')
+    print(f"Ran queries in {time() - start_time:.2f} seconds")
+    connection.close()
+
+
+if __name__ == "__main__":
+    main()
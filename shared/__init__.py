@@ -0,0 +1,3 @@
+"""
+Dataset-independent code shared by the phone_calls and social_network scripts.
+"""
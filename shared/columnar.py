@@ -0,0 +1,245 @@
+"""
+Columnar, memory-mapped cache of the raw JSON inputs, keyed by file content hash.
+
+Each input file is parsed once into numpy arrays (strings are dictionary-encoded, timestamps
+are converted to datetime64) and stored under data/.cache/<sha256 of file>/. Later runs
+memory-map the arrays instead of reparsing the JSON, as long as the input file is unchanged.
+The datetime fields of each dataset are set in its own preprocess.py.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+CACHE_DIR = os.path.join("data", ".cache")
+CACHE_VERSION = 1
+
+
+class Table:
+    "Columnar view of an input file: one array per field, strings stored as dictionary codes"
+
+    def __init__(
+        self,
+        columns: Dict[str, np.ndarray],
+        dictionaries: Dict[str, np.ndarray],
+        valid: Dict[str, np.ndarray],
+        num_rows: int,
+    ) -> None:
+        self.columns = columns
+        self.dictionaries = dictionaries
+        self.valid = valid
+        self.num_rows = num_rows
+
+    def __len__(self) -> int:
+        return self.num_rows
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.columns
+
+    def codes(self, name: str) -> np.ndarray:
+        "Dictionary codes of a string column (-1 where the field is missing)"
+        return self.columns[name]
+
+    def values(self, name: str) -> np.ndarray:
+        "Decoded values of a column; missing strings decode to an empty string"
+        column = self.columns[name]
+        if name in self.dictionaries:
+            dictionary = self.dictionaries[name]
+            if len(dictionary) == 0:
+                return np.full(len(column), "", dtype="<U1")
+            decoded = dictionary[np.maximum(column, 0)]
+            return np.where(column >= 0, decoded, "")
+        return column
+
+    def unique(self, name: str) -> np.ndarray:
+        "Sorted unique values of a column (the dictionary itself for string columns)"
+        if name in self.dictionaries:
+            return self.dictionaries[name]
+        column = self.columns[name]
+        if name in self.valid:
+            column = column[self.valid[name]]
+        return np.unique(column)
+
+    def records(self) -> List[Dict[str, Any]]:
+        "Rebuild the list of dicts from the raw JSON (missing fields stay missing)"
+        fields = []
+        for name, column in self.columns.items():
+            if name in self.dictionaries:
+                present = column >= 0
+                values = self.dictionaries[name].tolist()
+                items = [values[code] if code >= 0 else None for code in column.tolist()]
+            elif np.issubdtype(column.dtype, np.datetime64):
+                present = ~np.isnat(column)
+                items = np.datetime_as_string(column, unit="s").tolist()
+            else:
+                present = self.valid.get(name, np.ones(len(column), dtype=bool))
+                items = column.tolist()
+            fields.append((name, items, present.tolist()))
+
+        result = [{} for _ in range(self.num_rows)]
+        for name, items, present in fields:
+            for row, item, is_present in zip(result, items, present):
+                if is_present:
+                    row[name] = item
+        return result
+
+
+def file_hash(filename: str) -> str:
+    "SHA-256 of the file contents, used as the cache key"
+    sha = hashlib.sha256()
+    with open(filename, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def load_table(
+    filename: str, cache_dir: str = CACHE_DIR, datetime_fields: Sequence[str] = ()
+) -> Table:
+    """
+    Memory-map the cached columns for this file, building the cache first if required.
+    Fields named in datetime_fields are converted from ISO-8601 strings to datetime64.
+    """
+    path = os.path.join(cache_dir, file_hash(filename))
+    if not _is_valid_cache(path):
+        _write_cache(_build_columns(filename, datetime_fields), path)
+    return _read_cache(path)
+
+
+def encode_strings(values: Sequence[Optional[str]]):
+    "Dictionary-encode strings into (sorted dictionary, int32 codes); None is encoded as -1"
+    present = [v for v in values if v is not None]
+    dictionary = np.array(sorted(set(present)), dtype=str)
+    lookup = {value: code for code, value in enumerate(dictionary.tolist())}
+    codes = np.array([lookup[v] if v is not None else -1 for v in values], dtype=np.int32)
+    return dictionary, codes
+
+
+def build_column(raw: Sequence[Any], is_datetime: bool = False):
+    """
+    Convert a list of raw values into (column, dictionary, valid mask). Strings are
+    dictionary-encoded, datetimes (ISO strings or epoch seconds) become datetime64[s] with
+    NaT for missing values; the dictionary and mask are None when they are not needed.
+    """
+    present = [v for v in raw if v is not None]
+    dictionary, valid = None, None
+    if is_datetime:
+        column = np.array([v if v is not None else "NaT" for v in raw], dtype="datetime64[s]")
+        return column, dictionary, valid
+    if all(isinstance(v, str) for v in present):
+        dictionary, column = encode_strings(raw)
+        return column, dictionary, valid
+    if all(isinstance(v, bool) for v in present):
+        column = np.array([bool(v) for v in raw], dtype=bool)
+    elif all(isinstance(v, int) and not isinstance(v, bool) for v in present):
+        column = np.array([v if v is not None else 0 for v in raw], dtype=np.int64)
+    elif all(isinstance(v, (int, float)) for v in present):
+        column = np.array([v if v is not None else np.nan for v in raw], dtype=np.float64)
+    else:
+        raise ValueError("Values of mixed types cannot be stored as a column")
+    if len(present) < len(raw):
+        valid = np.array([v is not None for v in raw], dtype=bool)
+    return column, dictionary, valid
+
+
+def build_csr(sources: np.ndarray, targets: np.ndarray, num_nodes: int):
+    """
+    Arrange an edge list in compressed sparse row form. Returns (indptr, indices, order):
+    the neighbours of node i are indices[indptr[i]:indptr[i + 1]] in ascending order, and
+    order permutes any per-edge property columns into the same layout.
+    """
+    sources = np.asarray(sources, dtype=np.int64)
+    targets = np.asarray(targets, dtype=np.int64)
+    order = np.lexsort((targets, sources))
+    indices = targets[order]
+    indptr = np.zeros(num_nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=num_nodes), out=indptr[1:])
+    return indptr, indices, order
+
+
+def _build_columns(filename: str, datetime_fields: Sequence[str]):
+    with open(filename) as f:
+        data = json.load(f)
+
+    names: List[str] = []
+    for item in data:
+        for key in item:
+            if key not in names:
+                names.append(key)
+
+    columns, dictionaries, valid = {}, {}, {}
+    for name in names:
+        raw = [item.get(name) for item in data]
+        try:
+            column, dictionary, mask = build_column(raw, is_datetime=name in datetime_fields)
+        except ValueError as e:
+            raise ValueError(f"Cannot store field '{name}' of {filename} as a column") from e
+        columns[name] = column
+        if dictionary is not None:
+            dictionaries[name] = dictionary
+        if mask is not None:
+            valid[name] = mask
+    return columns, dictionaries, valid, len(data)
+
+
+def _write_cache(built, path: str) -> None:
+    columns, dictionaries, valid, num_rows = built
+    parent = os.path.dirname(path)
+    os.makedirs(parent, exist_ok=True)
+    # Write into a temporary directory and rename it, so readers never see a partial cache
+    tmp = tempfile.mkdtemp(dir=parent)
+    for name, column in columns.items():
+        np.save(os.path.join(tmp, f"{name}.npy"), column)
+    for name, dictionary in dictionaries.items():
+        np.save(os.path.join(tmp, f"{name}.dict.npy"), dictionary)
+    for name, mask in valid.items():
+        np.save(os.path.join(tmp, f"{name}.valid.npy"), mask)
+    meta = {
+        "version": CACHE_VERSION,
+        "num_rows": num_rows,
+        "columns": list(columns),
+        "dictionaries": list(dictionaries),
+        "valid": list(valid),
+    }
+    with open(os.path.join(tmp, "meta.json"), "w") as f:
+        json.dump(meta, f)
+    # Another thread or process may have finished the same cache in the meantime: keep its
+    # copy, since readers may already have it open, and only clear out an unusable directory
+    if not _is_valid_cache(path):
+        shutil.rmtree(path, ignore_errors=True)
+    try:
+        os.replace(tmp, path)
+    except OSError:
+        shutil.rmtree(tmp, ignore_errors=True)
+        if not _is_valid_cache(path):
+            raise
+
+
+def _is_valid_cache(path: str) -> bool:
+    try:
+        with open(os.path.join(path, "meta.json")) as f:
+            return json.load(f).get("version") == CACHE_VERSION
+    except (OSError, ValueError):
+        return False
+
+
+def _read_cache(path: str) -> Table:
+    with open(os.path.join(path, "meta.json")) as f:
+        meta = json.load(f)
+
+    def mmap(name: str) -> np.ndarray:
+        filename = os.path.join(path, f"{name}.npy")
+        try:
+            return np.load(filename, mmap_mode="r")
+        except ValueError:
+            # Empty arrays cannot be memory-mapped
+            return np.load(filename)
+
+    columns = {name: mmap(name) for name in meta["columns"]}
+    dictionaries = {name: mmap(f"{name}.dict") for name in meta["dictionaries"]}
+    valid = {name: mmap(f"{name}.valid") for name in meta["valid"]}
+    return Table(columns, dictionaries, valid, meta["num_rows"])
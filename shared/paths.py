@@ -0,0 +1,94 @@
+"""
+Bidirectional breadth-first search over graphs held as CSR adjacency arrays.
+
+Each side records the parents of the nodes it reaches, so one or every shortest path can be
+rebuilt once the two frontiers meet, and the side with the smaller frontier is always the one
+expanded, so high-degree hubs are only expanded from one side.
+"""
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+# (indptr, indices): the neighbours of node i are indices[indptr[i]:indptr[i + 1]]
+Adjacency = Tuple[np.ndarray, np.ndarray]
+
+
+def shortest_paths(
+    forward: Adjacency,
+    backward: Adjacency,
+    source: int,
+    target: int,
+    max_hops: int,
+    all_paths: bool = False,
+) -> List[List[int]]:
+    """
+    Shortest paths from source to target with at most max_hops edges, found by a bidirectional
+    BFS over CSR arrays: `forward` is expanded from the source and `backward` (the reversed
+    edges) from the target, always on the side with the smaller frontier. Returns one path,
+    or every shortest path if all_paths is set; an empty list if there is none within the limit.
+    """
+    if source == target:
+        return [[source]]
+    num_nodes = len(forward[0]) - 1
+    sides = []
+    for adjacency, start in ((forward, source), (backward, target)):
+        distance = np.full(num_nodes, -1, dtype=np.int64)
+        distance[start] = 0
+        frontier = np.array([start], dtype=np.int64)
+        # parents[node] are the nodes one BFS level closer to this side's start
+        sides.append(
+            {
+                "adjacency": adjacency,
+                "distance": distance,
+                "frontier": frontier,
+                "parents": {},
+                "depth": 0,
+            }
+        )
+
+    while sides[0]["depth"] + sides[1]["depth"] < max_hops:
+        if len(sides[0]["frontier"]) == 0 or len(sides[1]["frontier"]) == 0:
+            return []
+        # Expand the side with the smaller frontier, so hubs are only expanded from one side
+        side, other = sides if len(sides[0]["frontier"]) <= len(sides[1]["frontier"]) else sides[::-1]
+        parents, children = _expand(side["adjacency"], side["frontier"])
+        unseen = side["distance"][children] < 0
+        parents, children = parents[unseen], children[unseen]
+        side["depth"] += 1
+        side["frontier"] = np.unique(children)
+        side["distance"][side["frontier"]] = side["depth"]
+        for parent, child in zip(parents.tolist(), children.tolist()):
+            side["parents"].setdefault(child, []).append(parent)
+
+        meeting = side["frontier"][other["distance"][side["frontier"]] >= 0]
+        if len(meeting):
+            totals = side["distance"][meeting] + other["distance"][meeting]
+            meeting = meeting[totals == totals.min()]
+            if not all_paths:
+                meeting = meeting[:1]
+            paths = []
+            for node in meeting.tolist():
+                heads = _paths_to_start(sides[0]["parents"], node, all_paths)
+                tails = _paths_to_start(sides[1]["parents"], node, all_paths)
+                paths.extend(head[::-1] + tail[1:] for head in heads for tail in tails)
+            return paths if all_paths else paths[:1]
+    return []
+
+
+def _expand(adjacency: Adjacency, frontier: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    "All (parent, child) edges leaving the frontier, gathered without a Python loop"
+    indptr, indices = adjacency
+    starts = indptr[frontier]
+    counts = indptr[frontier + 1] - starts
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return np.repeat(frontier, counts), indices[np.repeat(starts, counts) + offsets]
+
+
+def _paths_to_start(parents: Dict[int, List[int]], node: int, all_paths: bool) -> List[List[int]]:
+    "Paths from node back to the start of a BFS side, following the recorded parents"
+    if node not in parents:
+        return [[node]]
+    candidates = parents[node] if all_paths else parents[node][:1]
+    return [
+        [node] + path for parent in candidates for path in _paths_to_start(parents, parent, all_paths)
+    ]
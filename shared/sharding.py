@@ -0,0 +1,55 @@
+"""
+Driver pool and parallel fan-out shared by the sharded loaders and queries of both datasets.
+
+How records are routed to shards and how partial results are merged is specific to each
+dataset and lives in its own sharding.py.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Sequence
+
+from neo4j import GraphDatabase, BoltDriver
+
+# One Neo4j instance per shard, e.g. several local containers on consecutive bolt ports
+SHARD_URIS = [
+    "bolt://localhost:7687",
+    "bolt://localhost:7688",
+    "bolt://localhost:7689",
+]
+
+
+class ShardedConnection:
+    "One driver per shard; subclasses load the data routed to a shard in _load_shard"
+
+    def __init__(
+        self, uris: Sequence[str], user: str, password: str, filenames: Dict[str, str]
+    ) -> None:
+        self.drivers = [GraphDatabase.driver(uri, auth=(user, password)) for uri in uris]
+        self.filenames = filenames
+
+    def close(self) -> None:
+        for driver in self.drivers:
+            driver.close()
+
+    def load_shards(self, shards: Sequence[Any]) -> None:
+        "Load the data of every shard in parallel, re-raising the first failure"
+        with ThreadPoolExecutor(max_workers=len(self.drivers)) as executor:
+            futures = [
+                executor.submit(self._load_shard, driver, shard, data)
+                for shard, (driver, data) in enumerate(zip(self.drivers, shards))
+            ]
+            for future in futures:
+                future.result()
+
+    def _load_shard(self, driver: BoltDriver, shard: int, data: Any) -> None:
+        raise NotImplementedError
+
+
+def scatter(drivers: Sequence[BoltDriver], query: str, **params) -> List[List[dict]]:
+    "Run a read query on every shard in parallel and return the records of each shard"
+
+    def run(driver: BoltDriver) -> List[dict]:
+        with driver.session() as session:
+            return session.run(query, params).data()
+
+    with ThreadPoolExecutor(max_workers=len(drivers)) as executor:
+        return list(executor.map(run, drivers))
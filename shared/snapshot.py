@@ -0,0 +1,298 @@
+"""
+Export a live Neo4j graph into a compact, memory-mapped binary snapshot for offline analytics.
+
+Nodes and relationships are streamed out of Neo4j in one read per label and relationship type,
+fetched from the server a page of records at a time, and written as .npy arrays: per-label key
+and property columns, and per-relationship CSR offsets, neighbour arrays and property columns.
+The labels, relationships and properties to export are configured in each dataset's
+neo4j_snapshot.py. Reopening a snapshot memory-maps every array, so it costs milliseconds
+regardless of graph size and the pages are shared between all processes that open it.
+"""
+import json
+import os
+import shutil
+import tempfile
+from itertools import islice
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+from neo4j import BoltDriver
+
+from shared.columnar import build_column, build_csr
+
+SNAPSHOT_VERSION = 1
+PAGE_SIZE = 10000
+
+
+class Snapshot:
+    "Read-only, memory-mapped view of an exported graph snapshot"
+
+    def __init__(self, path: str) -> None:
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+        if self.meta.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported snapshot version in {path}")
+        self.path = path
+        # Each array is opened and memory-mapped once, on first use
+        self._arrays: Dict[str, np.ndarray] = {}
+
+    def _load(self, name: str) -> np.ndarray:
+        if name not in self._arrays:
+            filename = os.path.join(self.path, f"{name}.npy")
+            try:
+                self._arrays[name] = np.load(filename, mmap_mode="r")
+            except ValueError:
+                # Empty arrays cannot be memory-mapped
+                self._arrays[name] = np.load(filename)
+        return self._arrays[name]
+
+    def num_nodes(self, label: str) -> int:
+        return self.meta["nodes"][label]["count"]
+
+    def num_edges(self, rel_type: str) -> int:
+        return self.meta["relationships"][rel_type]["count"]
+
+    def keys(self, label: str) -> np.ndarray:
+        "Unique keys of a label, sorted so that a node's index is its position in this array"
+        return self._load(f"nodes/{label}.key")
+
+    def node_index(self, label: str, key: Any) -> int:
+        "Index of the node with this key, or -1 if it is not in the snapshot"
+        keys = self.keys(label)
+        i = int(np.searchsorted(keys, key))
+        return i if i < len(keys) and keys[i] == key else -1
+
+    def node_property(self, label: str, name: str) -> np.ndarray:
+        """
+        Decoded property column of a label, aligned with keys(label). Missing values read as
+        "", 0, NaN or NaT depending on the column type; node_valid tells them apart.
+        """
+        return self._column(f"nodes/{label}.{name}", self.meta["nodes"][label]["columns"][name])
+
+    def node_valid(self, label: str, name: str) -> np.ndarray:
+        "Boolean mask of the nodes of a label that have the property set"
+        return self._valid(f"nodes/{label}.{name}", self.meta["nodes"][label]["columns"][name])
+
+    def csr(self, rel_type: str) -> Tuple[np.ndarray, np.ndarray]:
+        "CSR offsets (over source nodes) and sorted neighbour indices (into target nodes)"
+        return self._load(f"edges/{rel_type}.indptr"), self._load(f"edges/{rel_type}.indices")
+
+    def neighbours(self, rel_type: str, index: int) -> np.ndarray:
+        indptr, indices = self.csr(rel_type)
+        return indices[indptr[index] : indptr[index + 1]]
+
+    def edge_property(self, rel_type: str, name: str) -> np.ndarray:
+        "Decoded relationship property column, aligned with the neighbour array"
+        column = self.meta["relationships"][rel_type]["columns"][name]
+        return self._column(f"edges/{rel_type}.{name}", column)
+
+    def edge_valid(self, rel_type: str, name: str) -> np.ndarray:
+        "Boolean mask of the relationships that have the property set"
+        column = self.meta["relationships"][rel_type]["columns"][name]
+        return self._valid(f"edges/{rel_type}.{name}", column)
+
+    def _column(self, prefix: str, column: Dict[str, bool]) -> np.ndarray:
+        values = self._load(prefix)
+        if column["dictionary"]:
+            dictionary = self._load(f"{prefix}.dict")
+            if len(dictionary) == 0:
+                return np.full(len(values), "", dtype="<U1")
+            return np.where(values >= 0, dictionary[np.maximum(values, 0)], "")
+        return values
+
+    def _valid(self, prefix: str, column: Dict[str, bool]) -> np.ndarray:
+        values = self._load(prefix)
+        if column["dictionary"]:
+            return values >= 0
+        if np.issubdtype(values.dtype, np.datetime64):
+            return ~np.isnat(values)
+        if column["valid"]:
+            return self._load(f"{prefix}.valid")
+        return np.ones(len(values), dtype=bool)
+
+
+def open_snapshot(path: str) -> Snapshot:
+    return Snapshot(path)
+
+
+def export_snapshot(
+    driver: BoltDriver,
+    path: str,
+    nodes: Dict[str, Dict[str, Any]],
+    relationships: Dict[str, Dict[str, Any]],
+    datetime_properties: Sequence[str] = (),
+    page_size: int = PAGE_SIZE,
+) -> None:
+    """
+    Stream the graph out of Neo4j and write it as a snapshot directory. Each label and
+    relationship type is a single read whose records are fetched page_size at a time.
+
+    nodes maps each label to its unique key and property columns, and relationships maps each
+    exported type to its source/target labels, MATCH pattern (binding a, r, b), optional WHERE
+    clause and property expressions. Properties named in datetime_properties are exported as
+    epoch seconds and stored as datetime64.
+    """
+    parent = os.path.dirname(os.path.abspath(path))
+    os.makedirs(parent, exist_ok=True)
+    # Write into a temporary directory and rename it, so readers never see a partial snapshot
+    tmp = tempfile.mkdtemp(dir=parent)
+    os.makedirs(os.path.join(tmp, "nodes"))
+    os.makedirs(os.path.join(tmp, "edges"))
+    meta: Dict[str, Any] = {"version": SNAPSHOT_VERSION, "nodes": {}, "relationships": {}}
+
+    with driver.session(fetch_size=page_size) as session:
+        # One read transaction, so that every relationship endpoint is in the node reads even
+        # while the graph is being written to
+        node_reads, relationship_reads = session.read_transaction(
+            _read_graph, nodes, relationships, page_size
+        )
+
+    # Neo4j internal ids of each label, sorted, with the snapshot index they map to
+    id_maps: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+    for label, spec in nodes.items():
+        ids, keys, properties = node_reads[label]
+        order = np.argsort(keys, kind="stable")
+        keys = keys[order]
+        if len(keys) > 1 and np.any(keys[1:] == keys[:-1]):
+            raise ValueError(f"Duplicate {label}.{spec['key']} values in the graph")
+        # Position of each internal id in the key-sorted order
+        index = np.empty(len(order), dtype=np.int64)
+        index[order] = np.arange(len(order))
+        id_order = np.argsort(ids)
+        id_maps[label] = (ids[id_order], index[id_order])
+
+        np.save(os.path.join(tmp, "nodes", f"{label}.key.npy"), keys)
+        columns = {}
+        for name, raw in properties.items():
+            columns[name] = _save_column(
+                os.path.join(tmp, "nodes", f"{label}.{name}"),
+                [raw[i] for i in order],
+                name in datetime_properties,
+            )
+        meta["nodes"][label] = {"key": spec["key"], "count": len(keys), "columns": columns}
+        print(f"Exported {len(keys)} {label} nodes")
+
+    for rel_type, spec in relationships.items():
+        src_ids, dst_ids, properties = relationship_reads[rel_type]
+        sources, known_sources = _to_index(id_maps[spec["source"]], src_ids)
+        targets, known_targets = _to_index(id_maps[spec["target"]], dst_ids)
+        # Endpoints without the exported source/target label have no node index; drop those
+        # edges rather than attach them to another node
+        known = known_sources & known_targets
+        kept = np.flatnonzero(known)
+        indptr, indices, order = build_csr(
+            sources[kept], targets[kept], len(id_maps[spec["source"]][0])
+        )
+        order = kept[order]
+
+        np.save(os.path.join(tmp, "edges", f"{rel_type}.indptr.npy"), indptr)
+        np.save(os.path.join(tmp, "edges", f"{rel_type}.indices.npy"), indices)
+        columns = {}
+        for name, raw in properties.items():
+            columns[name] = _save_column(
+                os.path.join(tmp, "edges", f"{rel_type}.{name}"),
+                [raw[i] for i in order.tolist()],
+                name in datetime_properties,
+            )
+        meta["relationships"][rel_type] = {
+            "source": spec["source"],
+            "target": spec["target"],
+            "count": len(indices),
+            "dropped": int(len(known) - len(kept)),
+            "columns": columns,
+        }
+        print(f"Exported {len(indices)} {rel_type} relationships")
+        if len(kept) < len(known):
+            print(f"Dropped {len(known) - len(kept)} {rel_type} relationships to unexported nodes")
+
+    with open(os.path.join(tmp, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=2)
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp, path)
+
+
+def _read_graph(
+    tx,
+    nodes: Dict[str, Dict[str, Any]],
+    relationships: Dict[str, Dict[str, Any]],
+    page_size: int,
+):
+    "Raw node and relationship reads of every exported label and relationship type"
+    node_reads = {label: _read_nodes(tx, label, spec, page_size) for label, spec in nodes.items()}
+    relationship_reads = {
+        rel_type: _read_relationships(tx, spec, page_size)
+        for rel_type, spec in relationships.items()
+    }
+    return node_reads, relationship_reads
+
+
+def _read_nodes(tx, label: str, spec: Dict[str, Any], page_size: int):
+    returns = ", ".join(f"n.{name} AS {name}" for name in spec["properties"])
+    query = f"""
+        MATCH (n:{label})
+        RETURN id(n) AS id, n.{spec['key']} AS key{', ' + returns if returns else ''}
+    """
+    ids: List[int] = []
+    keys: List[Any] = []
+    properties: Dict[str, List[Any]] = {name: [] for name in spec["properties"]}
+    for page in _pages(tx, query, page_size):
+        for record in page:
+            ids.append(record["id"])
+            keys.append(record["key"])
+            for name in spec["properties"]:
+                properties[name].append(record[name])
+    return np.array(ids, dtype=np.int64), np.array(keys), properties
+
+
+def _read_relationships(tx, spec: Dict[str, Any], page_size: int):
+    returns = ", ".join(f"{expr} AS {name}" for name, expr in spec["properties"].items())
+    query = f"""
+        MATCH {spec['pattern']}
+        {'WHERE ' + spec['where'] if 'where' in spec else ''}
+        RETURN id(a) AS src, id(b) AS dst{', ' + returns if returns else ''}
+    """
+    src_ids: List[np.ndarray] = []
+    dst_ids: List[np.ndarray] = []
+    properties: Dict[str, List[Any]] = {name: [] for name in spec["properties"]}
+    for page in _pages(tx, query, page_size):
+        src_ids.append(np.array([record["src"] for record in page], dtype=np.int64))
+        dst_ids.append(np.array([record["dst"] for record in page], dtype=np.int64))
+        for name in spec["properties"]:
+            properties[name].extend(record[name] for record in page)
+    empty = np.zeros(0, dtype=np.int64)
+    return np.concatenate(src_ids or [empty]), np.concatenate(dst_ids or [empty]), properties
+
+
+def _pages(tx, query: str, page_size: int):
+    """
+    Yield the records of a single streamed query in pages. The driver pulls records from the
+    server in batches of the session's fetch size, so the query runs once and is never re-sorted.
+    """
+    result = iter(tx.run(query))
+    while True:
+        page = list(islice(result, page_size))
+        if not page:
+            return
+        yield page
+
+
+def _to_index(
+    id_map: Tuple[np.ndarray, np.ndarray], ids: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    "Snapshot indices of internal ids, and a mask of the ids that are in the map at all"
+    sorted_ids, index = id_map
+    if len(sorted_ids) == 0:
+        return np.zeros(len(ids), dtype=np.int64), np.zeros(len(ids), dtype=bool)
+    positions = np.minimum(np.searchsorted(sorted_ids, ids), len(sorted_ids) - 1)
+    known = sorted_ids[positions] == ids
+    return np.where(known, index[positions], 0), known
+
+
+def _save_column(prefix: str, raw: List[Any], is_datetime: bool) -> Dict[str, bool]:
+    column, dictionary, valid = build_column(raw, is_datetime=is_datetime)
+    np.save(f"{prefix}.npy", column)
+    if dictionary is not None:
+        np.save(f"{prefix}.dict.npy", dictionary)
+    if valid is not None:
+        np.save(f"{prefix}.valid.npy", valid)
+    return {"dictionary": dictionary is not None, "valid": valid is not None}
@@ -1,6 +1,9 @@
-import json
+import numpy as np
 from grakn.client import GraknClient
 
+from locations import load_locations
+from preprocess import load_table
+
 
 def build_graph(keyspace_name):
     # Builds a Grakn graph within the specified keyspace
@@ -13,11 +16,13 @@ def build_graph(keyspace_name):
 def load_location_into_grakn(session):
     # Load in the required files containing location entity information for the graph
     for case in LOCATION_INPUTS:
-        data = parse_input_json(case['file'])
-        # Store unique names of countries and regions and their connections for populating within graph
-        regions = list(set([item['region'] for item in data]))
-        countries = list(set([item['country'] for item in data]))
-        connections = list(set([(item['country'], item['region']) for item in data]))  # tuple (country, region)
+        table = load_table(case['file'])
+        # Unique names of countries and regions come straight from the dictionary-encoded columns
+        regions = table.unique('region').tolist()
+        countries = table.unique('country').tolist()
+        # Deduplicate (country, region) code pairs and decode them into tuple (country, region)
+        pairs = np.unique(np.stack([table.codes('country'), table.codes('region')], axis=1), axis=0)
+        connections = [(countries[c], regions[r]) for c, r in pairs.tolist()]
 
         for region in regions:
             print(f"Inserting entity: {region}")
@@ -73,9 +78,11 @@ def country_to_region(location):
 
 def city_to_country(location):
     # Insert city (unique cityID) and its relationship with the corresponding country from the dataset
+    # The country and region names are also stamped on the city, so queries can filter without joins
     query = f'''
         match $country isa country, has name "{location['country']}";
-        insert $city isa city, has city-id {location['cityID']}, has name "{location['city']}";
+        insert $city isa city, has city-id {location['cityID']}, has name "{location['city']}",
+            has country-name "{location['country']}", has region-name "{location['region']}";
         (in-country: $city, contains-city: $country) isa has-city;
     '''
     return query
@@ -83,11 +90,14 @@ def city_to_country(location):
 
 def person_to_city(data):
     # Insert person (unique personID) and their relationship with the corresponding city from the dataset
+    # The country and region names are also stamped on the person, so queries can filter without joins
+    region = load_locations().region_of(data['country'])
     query = f'''
         match $city isa city, has name "{data['city']}";
         $country isa country, has name "{data['country']}";
         (in-country: $city, contains-city: $country) isa has-city;
-        insert $person isa person, has person-id {data['personID']}, has age {data['age']};
+        insert $person isa person, has person-id {data['personID']}, has age {data['age']},
+            has country-name "{data['country']}", has region-name "{region}";
         (in-city: $person, contains-residence: $city) isa has-residence;
     '''
     return query
@@ -104,10 +114,8 @@ def person_to_person(data):
 
 
 def parse_input_json(filename):
-    # Return JSON data
-    with open(filename) as f:
-        data = json.load(f)
-    return data
+    # Return JSON data, read from the columnar cache that is only rebuilt when the file changes
+    return load_table(filename).records()
 
 
 # The filenames and methods we wish to use in this graph build operation
@@ -3,6 +3,8 @@ Run custom Graql queries on Grakn graph to answer questions based on business ca
 """
 from grakn.client import GraknClient
 
+from locations import load_locations
+
 keyspace_name = "social_network"
 
 
@@ -17,6 +19,15 @@ def run_queries():
                 _ = query3(transaction, region='East Asia')
                 _ = query3(transaction, region='Latin America')
                 _ = query4(transaction, age_lower=29, age_upper=46)
+                _ = query5(transaction, k=3)
+                _ = query6(transaction, person1=1, person2=51, max_hops=6, all_paths=True)
+                _ = query3_batch(transaction, regions=['East Asia', 'Latin America'])
+                _ = query4_batch(transaction, age_ranges=[(18, 29), (29, 46), (46, 65)])
+                _ = region_age_dashboard(
+                    transaction,
+                    regions=['East Asia', 'Latin America'],
+                    age_ranges=[(18, 29), (29, 46), (46, 65)],
+                )
 
 
 def query1(transaction):
@@ -83,14 +94,12 @@ def query3(transaction, **params):
     """
     Which are the top 5 cities in a particular region of the world with the lowest average age in the network?
     """
+    load_locations().check_regions([params['region']])
     query = f'''
-        match $person isa person, has age $age;
-        $region isa region, has name "{params['region']}";
+        match $person isa person, has age $age, has region-name "{params['region']}";
         $city isa city, has name $city-name;
-        (contains-country: $region, in-region: $country) isa has-country;
-        (contains-city: $country, in-country: $city) isa has-city;
         (contains-residence: $city, in-city: $person) isa has-residence;
-        get $age, $city-name; group $city-name; mean $age;
+        get $person, $age, $city-name; group $city-name; mean $age;
     '''
     print(f"\nQuery 3:\n {query}")
     iterator = transaction.query(query)
@@ -113,10 +122,8 @@ def query4(transaction, **params):
     """
     query = f'''
         match $person isa person,
-          has age > {params['age_lower']}, has age < {params['age_upper']};
-        $country isa country, has name $country-name;
-        (contains-city: $country, in-country: $city) isa has-city;
-        (contains-residence: $city, in-city: $person) isa has-residence;
+          has age > {params['age_lower']}, has age < {params['age_upper']},
+          has country-name $country-name;
         get; group $country-name; count;
     '''
     print(f"\nQuery 4:\n {query}")
@@ -134,5 +141,179 @@ def query4(transaction, **params):
     return sorted_results
 
 
+def query5(transaction, **params):
+    """
+    Who are the top 3 most influential persons in the network?
+
+    NOTE: Reads the PageRank scores written back to each person by influence.py
+    """
+    query = f'''
+        match $person isa person, has person-id $person-id, has influence $influence;
+        get $person-id, $influence; sort $influence desc; limit {params['k']};
+    '''
+    print(f"\nQuery 5:\n {query}")
+    iterator = transaction.query(query)
+    result = []
+
+    for answer in iterator:
+        person = answer.get('person-id').value()
+        influence = answer.get('influence').value()
+        result.append({'personID': person, 'influence': influence})
+
+    print(f"Top {params['k']} most influential persons:\n{result}")
+    return result
+
+
+def query6(transaction, **params):
+    """
+    How is one person connected to another over follower connections, within a maximum number of hops?
+
+    NOTE: Grakn's compute path treats relations as undirected, so only direction "both" is supported.
+    The resulting paths alternate between person and connection concepts, and are converted back to
+    person IDs with a single match on the concept IDs of all persons on the paths.
+    """
+    if params.get('direction', 'both') != 'both':
+        raise ValueError("Grakn compute path only supports direction 'both'")
+    ids_query = f'''
+        match $person1 isa person, has person-id {params['person1']};
+        $person2 isa person, has person-id {params['person2']};
+        get;
+    '''
+    answers = list(transaction.query(ids_query))
+    if not answers:
+        return []
+    person1, person2 = answers[0].get('person1').id, answers[0].get('person2').id
+
+    query = f'''
+        compute path from {person1}, to {person2}, in [person, connection];
+    '''
+    print(f"\nQuery 6:\n {query}")
+    max_hops = params.get('max_hops', 6)
+    # A path of n hops holds n + 1 persons and n connections
+    paths = [answer.list() for answer in transaction.query(query)]
+    paths = [path for path in paths if (len(path) - 1) // 2 <= max_hops]
+    if not params.get('all_paths'):
+        paths = paths[:1]
+
+    concept_ids = sorted({concept_id for path in paths for concept_id in path[::2]})
+    person_ids = {}
+    if concept_ids:
+        id_filter = ' or '.join(f'{{ $person id {concept_id}; }}' for concept_id in concept_ids)
+        persons_query = f'''
+            match $person isa person, has person-id $person-id;
+            {id_filter};
+            get;
+        '''
+        for answer in transaction.query(persons_query):
+            person_ids[answer.get('person').id] = answer.get('person-id').value()
+
+    result = [[person_ids[concept_id] for concept_id in path[::2]] for path in paths]
+    print(f"Shortest paths from person {params['person1']} to person {params['person2']}:\n{result}")
+    return result
+
+
+def query3_batch(transaction, **params):
+    """
+    query3 for a list of regions, matched once and grouped by region name
+    """
+    load_locations().check_regions(params['regions'])
+    # An empty disjunction would leave the match unfiltered
+    if not params['regions']:
+        return {}
+    region_filter = ' or '.join(f'{{ $region-name == "{region}"; }}' for region in params['regions'])
+    query = f'''
+        match $person isa person, has age $age, has region-name $region-name;
+        {region_filter};
+        $city isa city, has name $city-name;
+        (contains-residence: $city, in-city: $person) isa has-residence;
+        get $person, $age, $region-name, $city-name; group $region-name;
+    '''
+    print(f"\nQuery 3 (batch):\n {query}")
+    iterator = transaction.query(query)
+    result = {region: [] for region in params['regions']}
+
+    for item in list(iterator):
+        region = item.owner().value()
+        ages = {}
+        for answer in item.answers():
+            ages.setdefault(answer.get('city-name').value(), []).append(answer.get('age').value())
+        cities = [{'city': city, 'averageAge': sum(a) / len(a)} for city, a in ages.items()]
+        result[region] = sorted(cities, key=lambda x: x['averageAge'])[:5]
+
+    print(f"5 cities with lowest average age per region:\n{result}")
+    return result
+
+
+def query4_batch(transaction, **params):
+    """
+    query4 for a list of (age_lower, age_upper) ranges, matched once and grouped by country name
+    """
+    age_ranges = [tuple(age_range) for age_range in params['age_ranges']]
+    if not age_ranges:
+        return {}
+    query = f'''
+        match $person isa person,
+          has age > {min(lower for lower, _ in age_ranges)},
+          has age < {max(upper for _, upper in age_ranges)},
+          has age $age, has country-name $country-name;
+        get $person, $age, $country-name; group $country-name;
+    '''
+    print(f"\nQuery 4 (batch):\n {query}")
+    iterator = transaction.query(query)
+    counts = {age_range: [] for age_range in age_ranges}
+
+    for item in list(iterator):
+        country = item.owner().value()
+        ages = [answer.get('age').value() for answer in item.answers()]
+        for lower, upper in age_ranges:
+            person_counts = sum(1 for age in ages if lower < age < upper)
+            if person_counts:
+                counts[(lower, upper)].append({'country': country, 'personCounts': person_counts})
+
+    result = {
+        age_range: sorted(countries, key=lambda x: x['personCounts'], reverse=True)[:3]
+        for age_range, countries in counts.items()
+    }
+    print(f"3 countries with the most people per age range:\n{result}")
+    return result
+
+
+def region_age_dashboard(transaction, **params):
+    """
+    Person counts and average age for every (region, age range) combination in one query
+    """
+    load_locations().check_regions(params['regions'])
+    if not params['regions']:
+        return {}
+    age_ranges = [tuple(age_range) for age_range in params['age_ranges']]
+    region_filter = ' or '.join(f'{{ $region-name == "{region}"; }}' for region in params['regions'])
+    query = f'''
+        match $person isa person, has age $age, has region-name $region-name;
+        {region_filter};
+        get $person, $age, $region-name; group $region-name;
+    '''
+    print(f"\nRegion by age range dashboard:\n {query}")
+    iterator = transaction.query(query)
+    result = {
+        (region, age_range): {'personCounts': 0, 'averageAge': None}
+        for region in params['regions']
+        for age_range in age_ranges
+    }
+
+    for item in list(iterator):
+        region = item.owner().value()
+        ages = [answer.get('age').value() for answer in item.answers()]
+        for lower, upper in age_ranges:
+            in_range = [age for age in ages if lower < age < upper]
+            if in_range:
+                result[(region, (lower, upper))] = {
+                    'personCounts': len(in_range),
+                    'averageAge': sum(in_range) / len(in_range),
+                }
+
+    print(f"Person counts and average age per region and age range:\n{result}")
+    return result
+
+
 if __name__ == "__main__":
     run_queries()
\ No newline at end of file
@@ -0,0 +1,209 @@
+"""
+Compute PageRank influence scores over the FOLLOWS graph and write them back as a Person property.
+
+The edge list is pulled in bulk (from Neo4j, or from the preprocessed input cache), PageRank
+is run as a vectorized sparse power iteration, optionally personalized to the persons of one
+region, and the scores are written back in batched transactions. Once written, "top-k most
+influential" is an indexed property lookup, as cheap as the follower-count query.
+"""
+import re
+from typing import Optional, Tuple
+
+import numpy as np
+from neo4j import GraphDatabase, BoltDriver
+
+from locations import load_locations
+from preprocess import load_table
+
+DAMPING = 0.85
+TOLERANCE = 1e-10
+MAX_ITERATIONS = 100
+BATCH_SIZE = 1000
+
+
+def pagerank(
+    sources: np.ndarray,
+    targets: np.ndarray,
+    num_nodes: int,
+    damping: float = DAMPING,
+    tolerance: float = TOLERANCE,
+    max_iterations: int = MAX_ITERATIONS,
+    personalization: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """
+    PageRank of nodes 0..num_nodes-1 over the directed edges sources[i] -> targets[i].
+
+    The teleport (and dangling-node) distribution is uniform unless a non-negative
+    personalization vector is given. Iteration stops once the L1 change between
+    successive score vectors drops below the tolerance.
+    """
+    sources = np.asarray(sources, dtype=np.int64)
+    targets = np.asarray(targets, dtype=np.int64)
+    if personalization is None:
+        teleport = np.full(num_nodes, 1.0 / num_nodes)
+    else:
+        teleport = np.asarray(personalization, dtype=np.float64)
+        if teleport.shape != (num_nodes,) or teleport.min() < 0 or teleport.sum() <= 0:
+            raise ValueError("Personalization must be a non-negative vector with a positive sum")
+        teleport = teleport / teleport.sum()
+
+    out_degree = np.bincount(sources, minlength=num_nodes).astype(np.float64)
+    dangling = out_degree == 0
+    # Transition weight of each edge, so that one iteration is a single weighted bincount
+    weights = 1.0 / out_degree[sources]
+
+    scores = teleport.copy()
+    for _ in range(max_iterations):
+        spread = np.bincount(targets, weights=scores[sources] * weights, minlength=num_nodes)
+        dangling_mass = scores[dangling].sum()
+        updated = damping * (spread + dangling_mass * teleport) + (1 - damping) * teleport
+        change = np.abs(updated - scores).sum()
+        scores = updated
+        if change < tolerance:
+            break
+    return scores
+
+
+def follows_from_neo4j(driver: BoltDriver) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    "Pull (person IDs, regions, follower IDs, followee IDs) from Neo4j in two bulk reads"
+    with driver.session() as session:
+        persons = session.run(
+            """
+            MATCH (p:Person)
+            RETURN p.personID AS personID, p.region AS region
+            """
+        ).data()
+        follows = session.run(
+            """
+            MATCH (p1:Person) -[:FOLLOWS]-> (p2:Person)
+            RETURN p1.personID AS follower, p2.personID AS followee
+            """
+        ).data()
+    return (
+        np.array([p["personID"] for p in persons], dtype=np.int64),
+        np.array([p["region"] or "" for p in persons], dtype=str),
+        np.array([f["follower"] for f in follows], dtype=np.int64),
+        np.array([f["followee"] for f in follows], dtype=np.int64),
+    )
+
+
+def follows_from_cache(
+    locations: str = "data/city_in_region.json",
+    person_to_city: str = "data/person_in_city.json",
+    person_to_person: str = "data/person_connections.json",
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    "Same as follows_from_neo4j, read from the preprocessed input files"
+    hierarchy = load_locations(locations)
+    persons = load_table(person_to_city)
+    follows = load_table(person_to_person)
+    regions = [
+        hierarchy.country_region.get(country, "") for country in persons.values("country").tolist()
+    ]
+    return (
+        np.asarray(persons.values("personID")),
+        np.array(regions, dtype=str),
+        np.asarray(follows.values("personID")),
+        np.asarray(follows.values("connectionID")),
+    )
+
+
+def influence_scores(
+    person_ids: np.ndarray,
+    regions: np.ndarray,
+    followers: np.ndarray,
+    followees: np.ndarray,
+    region: Optional[str] = None,
+    **kwargs,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    PageRank of every person over FOLLOWS edges (follower -> followee), returned as
+    (sorted person IDs, scores). When a region is given, teleports only go to persons
+    living in that region.
+    """
+    ids, first = np.unique(person_ids, return_index=True)
+    # Deduplicate edges (the graph MERGEs FOLLOWS) and drop those to unknown persons
+    pairs = np.unique(np.stack([followers, followees], axis=1), axis=0)
+    sources = np.searchsorted(ids, pairs[:, 0])
+    targets = np.searchsorted(ids, pairs[:, 1])
+    known = (sources < len(ids)) & (targets < len(ids))
+    known[known] = (ids[sources[known]] == pairs[known, 0]) & (ids[targets[known]] == pairs[known, 1])
+
+    personalization = None
+    if region is not None:
+        personalization = (np.asarray(regions)[first] == region).astype(np.float64)
+        if not personalization.any():
+            raise ValueError(f"No persons live in region '{region}'")
+    scores = pagerank(
+        sources[known], targets[known], len(ids), personalization=personalization, **kwargs
+    )
+    return ids, scores
+
+
+def write_scores_to_neo4j(
+    driver: BoltDriver,
+    person_ids: np.ndarray,
+    scores: np.ndarray,
+    property_name: str = "influence",
+    batch_size: int = BATCH_SIZE,
+) -> None:
+    "Write scores to an indexed Person property, one transaction per batch"
+    if not re.fullmatch(r"[A-Za-z_][A-Za-z0-9_]*", property_name):
+        raise ValueError(f"Invalid property name '{property_name}'")
+    rows = [
+        {"personID": person_id, "score": score}
+        for person_id, score in zip(person_ids.tolist(), scores.tolist())
+    ]
+    with driver.session() as session:
+        session.run(
+            f"CREATE INDEX person_{property_name} IF NOT EXISTS FOR (p:Person) ON (p.{property_name})"
+        )
+        for start in range(0, len(rows), batch_size):
+            session.write_transaction(_set_scores, rows[start : start + batch_size], property_name)
+
+
+def _set_scores(tx, rows, property_name: str) -> None:
+    tx.run(
+        f"""
+        UNWIND $rows AS row
+        MATCH (p:Person {{personID: row.personID}})
+        SET p.{property_name} = row.score
+        """,
+        rows=rows,
+    )
+
+
+def write_scores_to_grakn(
+    session, person_ids: np.ndarray, scores: np.ndarray, batch_size: int = BATCH_SIZE
+) -> None:
+    """
+    Replace the influence attribute of each person, committing one transaction per batch.
+    Scores are written in fixed-point notation, as Graql double literals cannot use exponents.
+    """
+    rows = list(zip(person_ids.tolist(), scores.tolist()))
+    for start in range(0, len(rows), batch_size):
+        with session.transaction().write() as transaction:
+            for person_id, score in rows[start : start + batch_size]:
+                transaction.query(
+                    f"""
+                    match $person isa person, has person-id {person_id}, has influence $score via $r;
+                    delete $r;
+                    """
+                )
+                transaction.query(
+                    f"""
+                    match $person isa person, has person-id {person_id};
+                    insert $person has influence {score:.17f};
+                    """
+                )
+            transaction.commit()
+
+
+if __name__ == "__main__":
+    driver = GraphDatabase.driver("bolt://localhost:7687", auth=("neo4j", "12345"))
+    person_ids, regions, followers, followees = follows_from_neo4j(driver)
+    ids, scores = influence_scores(person_ids, regions, followers, followees)
+    print("Writing influence scores...")
+    write_scores_to_neo4j(driver, ids, scores)
+    driver.close()
+    top = np.argsort(-scores)[:3]
+    print(f"Finished! Top 3 most influential persons:\n{list(zip(ids[top].tolist(), scores[top].tolist()))}")
@@ -0,0 +1,90 @@
+"""
+Answer social_network queries locally from the preprocessed input files, without a database.
+
+FOLLOWS edges are held as sorted adjacency arrays (CSR) in both directions, and "how is person X
+connected to person Y" is answered by the bidirectional BFS in shared/paths.py, which always expands the smaller
+frontier, so high-degree hubs are only expanded from one side.
+"""
+from time import time
+from typing import List, Tuple
+
+import numpy as np
+
+from preprocess import load_table
+from shared.columnar import build_csr
+from shared.paths import Adjacency, shortest_paths
+
+DIRECTIONS = ("out", "in", "both")
+
+
+class FollowGraph:
+    "Persons (indexed by sorted person ID) and sorted FOLLOWS adjacency arrays"
+
+    def __init__(
+        self,
+        person_to_city: str = "data/person_in_city.json",
+        person_to_person: str = "data/person_connections.json",
+    ) -> None:
+        persons = load_table(person_to_city)
+        follows = load_table(person_to_person)
+        self.person_ids = np.unique(
+            np.concatenate(
+                [
+                    persons.unique("personID"),
+                    follows.unique("personID"),
+                    follows.unique("connectionID"),
+                ]
+            )
+        )
+        n = len(self.person_ids)
+        followers = np.searchsorted(self.person_ids, follows.values("personID"))
+        followees = np.searchsorted(self.person_ids, follows.values("connectionID"))
+        pairs = np.unique(np.stack([followers, followees], axis=1), axis=0)
+        self.out_edges = build_csr(pairs[:, 0], pairs[:, 1], n)[:2]
+        self.in_edges = build_csr(pairs[:, 1], pairs[:, 0], n)[:2]
+        both = np.unique(np.concatenate([pairs, pairs[:, ::-1]]), axis=0)
+        self.any_edges = build_csr(both[:, 0], both[:, 1], n)[:2]
+
+    def index(self, person_id: int) -> int:
+        "Index of a person ID, or -1 if it is unknown"
+        i = int(np.searchsorted(self.person_ids, person_id))
+        return i if i < len(self.person_ids) and self.person_ids[i] == person_id else -1
+
+    def adjacency(self, direction: str) -> Tuple[Adjacency, Adjacency]:
+        "(forward, backward) adjacency for paths that follow edges in the given direction"
+        if direction == "out":
+            return self.out_edges, self.in_edges
+        if direction == "in":
+            return self.in_edges, self.out_edges
+        if direction == "both":
+            return self.any_edges, self.any_edges
+        raise ValueError(f"Direction must be one of {DIRECTIONS}, not '{direction}'")
+
+
+def degrees_of_separation(
+    graph: FollowGraph,
+    person1: int,
+    person2: int,
+    max_hops: int = 6,
+    direction: str = "out",
+    all_paths: bool = False,
+) -> List[List[int]]:
+    "Shortest FOLLOWS paths between two persons, as lists of person IDs"
+    forward, backward = graph.adjacency(direction)
+    source, target = graph.index(person1), graph.index(person2)
+    if source < 0 or target < 0:
+        return []
+    paths = shortest_paths(forward, backward, source, target, max_hops, all_paths)
+    return [graph.person_ids[path].tolist() for path in paths]
+
+
+def main() -> None:
+    start_time = time()
+    graph = FollowGraph()
+    paths = degrees_of_separation(graph, 1, 51, max_hops=6, direction="out", all_paths=True)
+    print(f"Shortest FOLLOWS paths from person 1 to person 51:\n{paths}")
+    print(f"Ran queries in {time() - start_time:.2f} seconds")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""
+In-memory lookup table of the static Country -> Region hierarchy in city_in_region.json.
+"""
+from functools import lru_cache
+from typing import Dict, Iterable, List
+
+from preprocess import load_table
+
+
+class LocationHierarchy:
+    def __init__(self, filename: str = "data/city_in_region.json") -> None:
+        table = load_table(filename)
+        countries = table.values("country").tolist()
+        regions = table.values("region").tolist()
+        self.country_region: Dict[str, str] = {}
+        self.region_countries: Dict[str, List[str]] = {}
+        for country, region in zip(countries, regions):
+            self.country_region[country] = region
+            if country not in self.region_countries.setdefault(region, []):
+                self.region_countries[region].append(country)
+
+    @property
+    def regions(self) -> List[str]:
+        return sorted(self.region_countries)
+
+    def region_of(self, country: str) -> str:
+        return self.country_region[country]
+
+    def check_regions(self, regions: Iterable[str]) -> List[str]:
+        "Reject region names that are not in the hierarchy, since they would silently match nothing"
+        regions = list(regions)
+        unknown = [region for region in regions if region not in self.region_countries]
+        if unknown:
+            raise ValueError(f"Unknown regions {unknown}, expected some of {self.regions}")
+        return regions
+
+
+@lru_cache(maxsize=None)
+def load_locations(filename: str = "data/city_in_region.json") -> LocationHierarchy:
+    "Shared lookup table, built once per process"
+    return LocationHierarchy(filename)
@@ -1,11 +1,12 @@
 """
 Use the Neo4j official Python bolt driver to populate a Neo4j graph
 """
-import json
 from neo4j import GraphDatabase
 from neo4j.work.transaction import Transaction
 from typing import Dict
 
+from preprocess import load_table
+
 
 class Neo4jConnection:
     def __init__(
@@ -38,6 +39,11 @@ class Neo4jConnection:
             "CREATE INDEX city_id IF NOT EXISTS FOR (city:City) ON (city.cityID) ",
             "CREATE INDEX country_name IF NOT EXISTS FOR (country:Country) ON (country.name) ",
             "CREATE INDEX region_name IF NOT EXISTS FOR (region:Region) ON (region.name) ",
+            # denormalised location keys, so region/country filters are index lookups
+            "CREATE INDEX city_country IF NOT EXISTS FOR (city:City) ON (city.country) ",
+            "CREATE INDEX city_region IF NOT EXISTS FOR (city:City) ON (city.region) ",
+            "CREATE INDEX person_country IF NOT EXISTS FOR (p:Person) ON (p.country) ",
+            "CREATE INDEX person_region IF NOT EXISTS FOR (p:Person) ON (p.region) ",
             # constraints
             "CREATE CONSTRAINT IF NOT EXISTS ON (p:Person) ASSERT p.personID IS UNIQUE",
         ]
@@ -68,7 +74,7 @@ class Neo4jConnection:
             UNWIND $data AS d
             MATCH (city:City {name: d.city, country: d.country})
             MERGE (p:Person {personID: d.personID})
-            SET p.age = d.age
+            SET p.age = d.age, p.city = city.name, p.country = city.country, p.region = city.region
             MERGE (p) -[:LIVES_IN]-> (city)
             """,
             data=data,
@@ -89,9 +95,8 @@ class Neo4jConnection:
 
 
 def parse_input_json(filename):
-    with open(filename) as f:
-        data = json.load(f)
-    return data
+    # Read rows from the columnar cache, which is only rebuilt when the JSON file changes
+    return load_table(filename).records()
 
 
 if __name__ == "__main__":
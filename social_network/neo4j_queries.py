@@ -4,6 +4,8 @@ Run custom Cypher queries on Neo4j graph to answer questions based on business c
 from time import time
 from neo4j import GraphDatabase, BoltDriver
 
+from locations import load_locations
+
 
 def query1(driver: BoltDriver) -> None:
     "Who are the top 3 most-followed persons in the network?"
@@ -35,9 +37,10 @@ def query2(driver: BoltDriver) -> None:
 
 def query3(driver: BoltDriver, **params) -> None:
     "Which are the top 5 cities in a particular region of the world with the lowest average age in the network?"
+    load_locations().check_regions([params["region"]])
     with driver.session() as session:
         query = """
-            MATCH (p:Person) -[:LIVES_IN]-> (c:City) -[*..2]-> (reg:Region {name: $region})
+            MATCH (c:City {region: $region}) <-[:LIVES_IN]- (p:Person)
             RETURN c.name AS city, c.country AS country, avg(p.age) AS averageAge
             ORDER BY averageAge LIMIT 5
         """
@@ -56,8 +59,7 @@ def query4(driver: BoltDriver, **params) -> None:
         query = """
             MATCH (p:Person)
             WHERE p.age > $age_lower AND p.age < $age_upper
-            MATCH (p) -[*..2]-> (country:Country)
-            RETURN country.name AS countries, count(country) AS personCounts
+            RETURN p.country AS countries, count(p) AS personCounts
             ORDER BY personCounts DESC LIMIT 3
         """
         print(f"\nQuery 4:\n {query}")
@@ -70,6 +72,128 @@ def query4(driver: BoltDriver, **params) -> None:
         )
 
 
+def query5(driver: BoltDriver, **params) -> None:
+    """
+    Who are the top 3 most influential persons in the network?
+
+    NOTE: Reads the PageRank scores written back to the Person nodes by influence.py
+    """
+    with driver.session() as session:
+        query = """
+            MATCH (person:Person)
+            WHERE person.influence IS NOT NULL
+            RETURN person.personID AS personID, person.influence AS influence
+            ORDER BY influence DESC LIMIT $k
+        """
+        print(f"\nQuery 5:\n {query}")
+        result = session.run(query, params)
+        print(f"Top {params['k']} most influential persons:\n{result.data()}")
+
+
+def query6(driver: BoltDriver, **params) -> None:
+    """
+    How is one person connected to another over FOLLOWS, within a maximum number of hops?
+
+    NOTE: direction is "out" (follow edges forwards), "in" or "both", and all_paths returns every
+    shortest path instead of one
+    """
+    patterns = {"out": "-[:FOLLOWS*..{}]->", "in": "<-[:FOLLOWS*..{}]-", "both": "-[:FOLLOWS*..{}]-"}
+    direction = params.get("direction", "out")
+    if direction not in patterns:
+        raise ValueError(f"Direction must be one of {tuple(patterns)}, not '{direction}'")
+    pattern = patterns[direction].format(int(params.get("max_hops", 6)))
+    function = "allShortestPaths" if params.get("all_paths") else "shortestPath"
+    with driver.session() as session:
+        if params["person1"] == params["person2"]:
+            # shortestPath fails when both ends are the same node: the path is the person alone
+            query = """
+                MATCH (p1:Person {personID: $person1})
+                RETURN [p1.personID] AS path
+            """
+        else:
+            query = f"""
+                MATCH (p1:Person {{personID: $person1}}), (p2:Person {{personID: $person2}})
+                MATCH path = {function}((p1) {pattern} (p2))
+                RETURN [person IN nodes(path) | person.personID] AS path
+            """
+        print(f"\nQuery 6:\n {query}")
+        result = session.run(query, person1=params["person1"], person2=params["person2"])
+        print(
+            f"Shortest paths from person {params['person1']} to person {params['person2']}:"
+            f"\n{result.data()}"
+        )
+
+
+def query3_batch(driver: BoltDriver, **params) -> dict:
+    "query3 for a list of regions in a single grouped query, keyed by region"
+    load_locations().check_regions(params["regions"])
+    with driver.session() as session:
+        query = """
+            UNWIND $regions AS region
+            MATCH (c:City {region: region}) <-[:LIVES_IN]- (p:Person)
+            WITH region, c, avg(p.age) AS averageAge
+            ORDER BY averageAge
+            WITH region, collect({city: c.name, country: c.country, averageAge: averageAge})[..5] AS cities
+            RETURN region, cities
+        """
+        print(f"\nQuery 3 (batch):\n {query}")
+        result = {region: [] for region in params["regions"]}
+        for record in session.run(query, regions=list(params["regions"])):
+            result[record["region"]] = record["cities"]
+        print(f"5 cities with lowest average age per region:\n{result}")
+        return result
+
+
+def query4_batch(driver: BoltDriver, **params) -> dict:
+    "query4 for a list of (age_lower, age_upper) ranges in a single pass, keyed by range"
+    with driver.session() as session:
+        query = """
+            MATCH (p:Person)
+            UNWIND $age_ranges AS range
+            WITH range, p
+            WHERE p.age > range[0] AND p.age < range[1]
+            WITH range, p.country AS country, count(p) AS personCounts
+            ORDER BY personCounts DESC
+            WITH range, collect({country: country, personCounts: personCounts})[..3] AS countries
+            RETURN range, countries
+        """
+        print(f"\nQuery 4 (batch):\n {query}")
+        age_ranges = [list(age_range) for age_range in params["age_ranges"]]
+        result = {tuple(age_range): [] for age_range in age_ranges}
+        for record in session.run(query, age_ranges=age_ranges):
+            result[tuple(record["range"])] = record["countries"]
+        print(f"3 countries with the most people per age range:\n{result}")
+        return result
+
+
+def region_age_dashboard(driver: BoltDriver, **params) -> dict:
+    "Person counts and average age for every (region, age range) combination in one query"
+    load_locations().check_regions(params["regions"])
+    with driver.session() as session:
+        query = """
+            UNWIND $regions AS region
+            MATCH (p:Person {region: region})
+            UNWIND $age_ranges AS range
+            WITH region, range, p
+            WHERE p.age > range[0] AND p.age < range[1]
+            RETURN region, range, count(p) AS personCounts, avg(p.age) AS averageAge
+        """
+        print(f"\nRegion by age range dashboard:\n {query}")
+        age_ranges = [list(age_range) for age_range in params["age_ranges"]]
+        result = {
+            (region, tuple(age_range)): {"personCounts": 0, "averageAge": None}
+            for region in params["regions"]
+            for age_range in age_ranges
+        }
+        for record in session.run(query, regions=list(params["regions"]), age_ranges=age_ranges):
+            result[(record["region"], tuple(record["range"]))] = {
+                "personCounts": record["personCounts"],
+                "averageAge": record["averageAge"],
+            }
+        print(f"Person counts and average age per region and age range:\n{result}")
+        return result
+
+
 def main() -> None:
     start_time = time()
     driver = GraphDatabase.driver("bolt://localhost:7687", auth=("neo4j", "12345"))
@@ -78,6 +202,13 @@ def main() -> None:
     query3(driver, region="East Asia")
     query3(driver, region="Latin America")
     query4(driver, age_lower=29, age_upper=46)
+    query5(driver, k=3)
+    query6(driver, person1=1, person2=51, max_hops=6, direction="out", all_paths=True)
+    query3_batch(driver, regions=["East Asia", "Latin America"])
+    query4_batch(driver, age_ranges=[(18, 29), (29, 46), (46, 65)])
+    region_age_dashboard(
+        driver, regions=["East Asia", "Latin America"], age_ranges=[(18, 29), (29, 46), (46, 65)]
+    )
     print(f"Ran queries in {time() - start_time:.2f} seconds")
 
 
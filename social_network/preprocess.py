@@ -0,0 +1,32 @@
+"""
+Convert the raw JSON inputs into a columnar, memory-mapped cache keyed by file content hash.
+
+The cache itself is implemented in shared/columnar.py; this module binds it to the fields of
+this dataset (none of its fields are timestamps) and warms it when run as a script.
+"""
+import os
+import sys
+from typing import Tuple
+
+# The only place that makes the shared package at the repository root importable: every
+# script of this dataset imports preprocess before any module from shared/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from shared import columnar  # noqa: E402
+from shared.columnar import CACHE_DIR, Table  # noqa: E402
+
+# Fields that are converted from ISO-8601 strings to datetime64 while preprocessing
+DATETIME_FIELDS: Tuple[str, ...] = ()
+
+
+def load_table(filename: str, cache_dir: str = CACHE_DIR) -> Table:
+    "Memory-map the cached columns for this file, building the cache first if required"
+    return columnar.load_table(filename, cache_dir, DATETIME_FIELDS)
+
+
+if __name__ == "__main__":
+    # Warm the cache for every input file of this dataset
+    for filename in sorted(os.listdir("data")):
+        if filename.endswith(".json"):
+            table = load_table(os.path.join("data", filename))
+            print(f"Cached {len(table)} rows from data/{filename}")
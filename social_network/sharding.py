@@ -0,0 +1,231 @@
+"""
+Partition the social network across several Neo4j databases by region, and answer queries by
+fanning out to every shard in parallel and merging the partial aggregates.
+
+Each person is stored on the shard that owns the region they live in. The location hierarchy is
+small and static, so every shard holds all of it. A FOLLOWS edge is stored on the shard of the
+person being followed: when the follower lives on another shard, the edge starts at a stub Person
+that carries only its personID and homeShard. All followers of a person are therefore on the
+person's home shard, which makes per-shard top-k follower counts exact to merge, and stubs drop
+out of the age and location aggregates because they have no age, city or country.
+"""
+from collections import Counter
+from time import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from neo4j import BoltDriver
+from neo4j.work.transaction import Transaction
+
+from locations import load_locations
+from neo4j_graph import Neo4jConnection, parse_input_json
+from shared.sharding import SHARD_URIS, ShardedConnection, scatter
+
+
+def assign_regions(
+    person_regions: Sequence[str], regions: Sequence[str], num_shards: int
+) -> Dict[str, int]:
+    """
+    Map every region to a shard, placing the most populous regions first on the least-loaded
+    shard so that shards hold similar numbers of persons
+    """
+    counts = Counter(person_regions)
+    loads = [0] * num_shards
+    region_shards = {}
+    for region in sorted(regions, key=lambda region: (-counts[region], region)):
+        shard = loads.index(min(loads))
+        region_shards[region] = shard
+        loads[shard] += counts[region]
+    return region_shards
+
+
+def partition(
+    filenames: Dict[str, str],
+    num_shards: int,
+    region_shards: Optional[Dict[str, int]] = None,
+) -> Tuple[Dict[str, int], List[Dict[str, List[dict]]]]:
+    """
+    Route persons by region and FOLLOWS edges by the shard of the person being followed.
+    Returns the region -> shard map and, per shard, the persons and follows to load there.
+    """
+    hierarchy = load_locations(filenames["locations"])
+    persons = parse_input_json(filenames["person_to_city"])
+    if region_shards is None:
+        person_regions = [hierarchy.region_of(p["country"]) for p in persons]
+        region_shards = assign_regions(person_regions, hierarchy.regions, num_shards)
+
+    shards: List[Dict[str, List[dict]]] = [
+        {"persons": [], "follows": []} for _ in range(num_shards)
+    ]
+    person_shards = {}
+    for person in persons:
+        shard = region_shards[hierarchy.region_of(person["country"])]
+        person_shards[person["personID"]] = shard
+        shards[shard]["persons"].append(person)
+    for follow in parse_input_json(filenames["person_to_person"]):
+        follower_shard = person_shards.get(follow["personID"])
+        followee_shard = person_shards.get(follow["connectionID"])
+        # Like the single-database loader, edges to unknown persons are dropped
+        if follower_shard is None or followee_shard is None:
+            continue
+        shards[followee_shard]["follows"].append({**follow, "followerShard": follower_shard})
+    return region_shards, shards
+
+
+class ShardedNeo4jConnection(ShardedConnection):
+    def run(self, region_shards: Optional[Dict[str, int]] = None) -> Dict[str, int]:
+        "Load every shard in parallel and return the region -> shard map that was used"
+        region_shards, shards = partition(self.filenames, len(self.drivers), region_shards)
+        self.load_shards(shards)
+        return region_shards
+
+    def _load_shard(self, driver: BoltDriver, shard: int, data: Dict[str, List[dict]]) -> None:
+        with driver.session() as session:
+            session.write_transaction(Neo4jConnection._create_indexes_and_constraints)
+            session.write_transaction(
+                Neo4jConnection._create_locations, self.filenames["locations"]
+            )
+            session.write_transaction(self._create_persons, shard, data["persons"])
+            session.write_transaction(self._create_follows, data["follows"])
+
+    @staticmethod
+    def _create_persons(tx: Transaction, shard: int, data: List[dict]) -> None:
+        tx.run(
+            """
+            UNWIND $data AS d
+            MATCH (city:City {name: d.city, country: d.country})
+            MERGE (p:Person {personID: d.personID})
+            SET p.age = d.age, p.city = city.name, p.country = city.country, p.region = city.region,
+                p.homeShard = $shard
+            MERGE (p) -[:LIVES_IN]-> (city)
+            """,
+            data=data,
+            shard=shard,
+        )
+
+    @staticmethod
+    def _create_follows(tx: Transaction, data: List[dict]) -> None:
+        "Followers living on other shards are created as stubs that only point to their home shard"
+        tx.run(
+            """
+            UNWIND $data AS d
+            MATCH (p2:Person {personID: d.connectionID})
+            MERGE (p1:Person {personID: d.personID})
+              ON CREATE SET p1.homeShard = d.followerShard
+            MERGE (p1) -[:FOLLOWS]-> (p2)
+            """,
+            data=data,
+        )
+
+
+def merge_top_k(partials: List[List[dict]], key: str, k: int) -> List[dict]:
+    "Top k records by `key` over the per-shard top-k lists, ties broken by personID"
+    records = [record for partial in partials for record in partial]
+    return sorted(records, key=lambda record: (-record[key], record["personID"]))[:k]
+
+
+def merge_mean(partials: List[List[dict]], group_by: Sequence[str], mean: str) -> List[dict]:
+    "Combine per-shard {ageSum, ageCount} partials per group into a mean, dropping empty groups"
+    totals: Dict[tuple, List[int]] = {}
+    for record in (record for partial in partials for record in partial):
+        total = totals.setdefault(tuple(record[field] for field in group_by), [0, 0])
+        total[0] += record["ageSum"]
+        total[1] += record["ageCount"]
+    return [
+        {**dict(zip(group_by, group)), mean: age_sum / age_count}
+        for group, (age_sum, age_count) in totals.items()
+        if age_count
+    ]
+
+
+def merge_counts(partials: List[List[dict]], group_by: str, count: str) -> Counter:
+    "Sum per-shard counts per group"
+    totals: Counter = Counter()
+    for record in (record for partial in partials for record in partial):
+        totals[record[group_by]] += record[count]
+    return totals
+
+
+def query1(drivers: Sequence[BoltDriver], k: int = 3) -> List[dict]:
+    "Who are the top k most-followed persons in the network?"
+    query = """
+        MATCH (follower:Person) -[:FOLLOWS]-> (person:Person)
+        RETURN person.personID AS personID, count(follower) AS numFollowers
+        ORDER BY numFollowers DESC, personID LIMIT $k
+    """
+    print(f"\nQuery 1 (sharded):\n {query}")
+    # Every follower of a person is on the person's home shard, so per-shard top k is exact
+    result = merge_top_k(scatter(drivers, query, k=k), "numFollowers", k)
+    print(f"Top {k} most-followed persons:\n{result}")
+    return result
+
+
+def query3(drivers: Sequence[BoltDriver], **params) -> List[dict]:
+    "Which are the top 5 cities in a particular region of the world with the lowest average age in the network?"
+    load_locations().check_regions([params["region"]])
+    query = """
+        MATCH (c:City {region: $region}) <-[:LIVES_IN]- (p:Person)
+        RETURN c.name AS city, c.country AS country, sum(p.age) AS ageSum, count(p.age) AS ageCount
+    """
+    print(f"\nQuery 3 (sharded):\n {query}")
+    cities = merge_mean(scatter(drivers, query, **params), ["city", "country"], "averageAge")
+    result = sorted(cities, key=lambda city: city["averageAge"])[:5]
+    print(f"5 cities with lowest average age in {params['region']}:\n{result}")
+    return result
+
+
+def query4(drivers: Sequence[BoltDriver], **params) -> List[dict]:
+    "Which 3 countries in the network have the most people within a specified age range?"
+    # Every country's count is needed from every shard, since a partial top 3 cannot be merged
+    query = """
+        MATCH (p:Person)
+        WHERE p.age > $age_lower AND p.age < $age_upper
+        RETURN p.country AS country, count(p) AS personCounts
+    """
+    print(f"\nQuery 4 (sharded):\n {query}")
+    counts = merge_counts(scatter(drivers, query, **params), "country", "personCounts")
+    result = [
+        {"country": country, "personCounts": person_counts}
+        for country, person_counts in counts.most_common(3)
+    ]
+    print(
+        f"3 Countries with the most people with age > {params['age_lower']} "
+        f"and < {params['age_upper']}:\n{result}"
+    )
+    return result
+
+
+def mean_age(drivers: Sequence[BoltDriver]) -> Optional[float]:
+    "Mean age of everyone in the network, combined from per-shard sums and counts"
+    query = """
+        MATCH (p:Person)
+        RETURN sum(p.age) AS ageSum, count(p.age) AS ageCount
+    """
+    merged = merge_mean(scatter(drivers, query), [], "averageAge")
+    return merged[0]["averageAge"] if merged else None
+
+
+def main() -> None:
+    filenames = {
+        "locations": "data/city_in_region.json",
+        "person_to_city": "data/person_in_city.json",
+        "person_to_person": "data/person_connections.json",
+    }
+    connection = ShardedNeo4jConnection(
+        uris=SHARD_URIS, user="neo4j", password="12345", filenames=filenames
+    )
+    print(f"Building graph across {len(SHARD_URIS)} shards...")
+    start_time = time()
+    region_shards = connection.run()
+    print(f"Loaded shards in {time() - start_time:.2f} seconds; region -> shard:\n{region_shards}")
+
+    start_time = time()
+    query1(connection.drivers, k=3)
+    query3(connection.drivers, region="East Asia")
+    query4(connection.drivers, age_lower=30, age_upper=40)
+    print(f"\nMean age across all shards: {mean_age(connection.drivers)}")
+    print(f"Ran queries in {time() - start_time:.2f} seconds")
+    connection.close()
+
+
+if __name__ == "__main__":
+    main()